@@ -0,0 +1,167 @@
+import math
+from typing import Dict, Iterable, List
+
+class P2Quantile:
+    """Streaming quantile estimate with the P-square algorithm (Jain & Chlamtac, 1985)
+
+    Keeps five markers instead of the observations, so memory is constant.
+    The estimate is exact for up to five observations.
+    """
+
+    def __init__(self, p: float):
+        if not 0 < p < 1:
+            raise ValueError("p must be between 0 and 1")
+        self.p = p
+        self.count = 0
+        self.heights: List[float] = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x: float):
+        """Add one observation"""
+        self.count += 1
+        heights = self.heights
+        if self.count <= 5:
+            heights.append(x)
+            heights.sort()
+            return
+
+        # Find the cell of x and extend the extreme markers if needed
+        if x < heights[0]:
+            heights[0] = x
+            k = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= heights[k + 1]:
+                k += 1
+
+        positions = self.positions
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Move the inner markers towards their desired positions
+        for i in range(1, 4):
+            d = self.desired[i] - positions[i]
+            if (d >= 1 and positions[i + 1] - positions[i] > 1) or (d <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if d > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+                heights[i] = height
+                positions[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        q, n = self.heights, self.positions
+        return q[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    @property
+    def value(self) -> float:
+        """Current estimate, 0 without observations"""
+        if self.count > 5:
+            return self.heights[2]
+        if not self.heights:
+            return 0
+        # Few observations: interpolate the sorted sample like np.quantile
+        rank = self.p * (len(self.heights) - 1)
+        lower = math.floor(rank)
+        upper = min(lower + 1, len(self.heights) - 1)
+        return self.heights[lower] + (rank - lower) * (self.heights[upper] - self.heights[lower])
+
+class RunningStats:
+    """Online count, mean, variance (Welford), min, max and optional P-square quantiles
+
+    Memory does not grow with the number of observations. Accumulators without
+    quantiles can be merged, e.g. to combine replications or machines.
+    """
+
+    def __init__(self, quantiles: Iterable[float] = ()):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared deviations from the mean
+        self.min = math.inf
+        self.max = -math.inf
+        self.quantiles: Dict[float, P2Quantile] = {p: P2Quantile(p) for p in quantiles}
+
+    def add(self, x: float):
+        """Add one observation"""
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        for estimator in self.quantiles.values():
+            estimator.add(x)
+
+    def merge(self, other: 'RunningStats') -> 'RunningStats':
+        """Combine with another accumulator in place (Chan et al.) and return self"""
+        if self.quantiles or other.quantiles:
+            raise ValueError("P-square quantile estimates cannot be merged")
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self) -> float:
+        """Population variance, as np.var"""
+        return self.m2 / self.count if self.count else 0
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation, as np.std"""
+        return math.sqrt(self.variance)
+
+    def quantile(self, p: float) -> float:
+        """Estimate of the p-quantile; p must have been passed to the constructor"""
+        return self.quantiles[p].value
+
+    def __bool__(self) -> bool:
+        return self.count > 0
+
+class TimeWeighted:
+    """Time-weighted average of a piecewise constant level, e.g. a queue length
+
+    The level is reported on every change, so averages are exact and no
+    sampling process is needed.
+    """
+
+    def __init__(self, level: float = 0, time: float = 0):
+        self.level = level
+        self.max = level
+        self.start = time
+        self.last_time = time
+        self.area = 0.0  # integral of the level from start to last_time
+
+    def update(self, level: float, time: float):
+        """Record that the level changes to `level` at `time`"""
+        self.area += self.level * (time - self.last_time)
+        self.last_time = time
+        self.level = level
+        if level > self.max:
+            self.max = level
+
+    def integral(self, time: float) -> float:
+        """Integral of the level from the start until `time`"""
+        return self.area + self.level * (time - self.last_time)
+
+    def mean(self, time: float) -> float:
+        """Time average of the level from the start until `time`"""
+        return self.integral(time) / (time - self.start) if time > self.start else self.level
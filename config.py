@@ -68,9 +68,21 @@ def get_processing_time(machine: str) -> float:
     config = MACHINE_CONFIG[machine]
     return random.triangular(config.min_time, config.mode_time, config.max_time)
 
-# Performance tracking configuration
+# Performance tracking configuration; queue lengths, utilization and WIP are tracked
+# as exact time averages on every change, so there is no collection interval
 TRACKING_CONFIG = {
-    'COLLECT_QUEUE_STATS': True,
-    'COLLECT_UTILIZATION_STATS': True,
-    'STATS_COLLECTION_INTERVAL': 1.0
+    # End the run once all orders have left the system, at SIM_TIME at the latest. Time averages
+    # (utilization, queue lengths, inventory costs) then cover the drained horizon instead of SIM_TIME
+    'STOP_WHEN_DRAINED': False,
+    # Keep every order's times in an OrderTable for per-order analysis. The summary statistics
+    # come from online accumulators either way, so without the table memory stays flat
+    'ORDER_TABLE': True,
+}
+
+# Event tracing configuration (see tracing.py); disabled tracing costs nothing on the hot path
+TRACING_CONFIG = {
+    'ENABLED': False,
+    'BUFFER_SIZE': 65536,  # events kept in the ring buffer, the oldest are overwritten
+    'SAMPLE_EVERY': 1,  # trace only orders whose id is a multiple of this
+    'DUMP_PATH': None,  # .npy file the trace is written to after the run, e.g. 'trace.npy'
 }
\ No newline at end of file
@@ -0,0 +1,247 @@
+import heapq
+from collections import deque
+import importlib.util
+import os
+import numpy as np
+import config
+from order_table import OrderTable
+
+# Fast engine for the push-mode manufacturing line: in push mode the line is a
+# tandem of FIFO multi-server stations without blocking, so start and finish
+# times follow from departure-time recursions instead of SimPy events.
+
+def generate_arrivals(rng: np.random.Generator, time_config: dict = config.TIME_CONFIG,
+                      system_config: dict = config.SYSTEM_CONFIG):
+    """Draw all batch arrivals; returns arrival time and batch id per order"""
+    n_batches = system_config['MAX_ORDERS']
+    # Batches arriving at SIM_TIME or later are never generated
+    n_batches = min(n_batches, int(np.ceil(time_config['SIM_TIME'] / time_config['ARRIVAL_RATE'])))
+    batch_sizes = rng.integers(time_config['MIN_BATCH_SIZE'], time_config['MAX_BATCH_SIZE'] + 1, size=n_batches)
+    batch_ids = np.repeat(np.arange(1, n_batches + 1), batch_sizes)
+    return np.asarray((batch_ids - 1) * time_config['ARRIVAL_RATE'], dtype=float), batch_ids
+
+def generate_service_times(rng: np.random.Generator, n_orders: int,
+                           machine_config: dict = config.MACHINE_CONFIG) -> np.ndarray:
+    """Draw triangular processing times, shape (order, station)"""
+    return np.column_stack([
+        rng.triangular(machine.min_time, machine.mode_time, machine.max_time, size=n_orders)
+        for machine in machine_config.values()
+    ])
+
+def station_times(arrival: np.ndarray, service: np.ndarray, capacity: int):
+    """Start and finish times at one FIFO station with `capacity` servers
+
+    Orders are served in order of arrival, ties by order id. A single server uses
+    the vectorized Lindley recursion finish_i = max(arrival_i, finish_i-1) + service_i;
+    several servers assign each order to the earliest free server.
+    An infinite service time marks an order that never finishes.
+    """
+    arrival = np.asarray(arrival, dtype=float)
+    order = np.argsort(arrival, kind='stable')
+    a = arrival[order]
+    s = np.asarray(service, dtype=float)[order]
+    start = np.empty_like(a)
+    finish = np.empty_like(a)
+
+    if capacity == 1:
+        # finish_i = S_i + max_j<=i (a_j - S_j-1), with S the cumulative service time.
+        # Orders behind one that never finishes never start
+        finite = np.isfinite(s)
+        cut = len(s) if finite.all() else np.argmin(finite)
+        cumulative = np.cumsum(s[:cut])
+        sorted_finish = np.full_like(a, np.inf)
+        sorted_finish[:cut] = cumulative + np.maximum.accumulate(a[:cut] - (cumulative - s[:cut]))
+        previous = np.concatenate(([-np.inf], sorted_finish[:-1]))
+        start[order] = np.maximum(a, previous)
+        finish[order] = sorted_finish
+        return start, finish
+
+    free = [0.0] * capacity  # heap of the times the servers become free
+    sorted_start = np.empty_like(a)
+    for i in range(len(a)):
+        sorted_start[i] = max(a[i], heapq.heappop(free))
+        heapq.heappush(free, sorted_start[i] + s[i])
+    start[order] = sorted_start
+    finish[order] = sorted_start + s
+    return start, finish
+
+def simulate(arrival: np.ndarray, batch_ids: np.ndarray, service: np.ndarray,
+             machine_config: dict = config.MACHINE_CONFIG) -> OrderTable:
+    """Run orders through all stations; returns the filled order table with unbounded time"""
+    orders = OrderTable(len(machine_config), capacity=max(len(arrival), 1))
+    n = len(arrival)
+    orders.n_orders = n
+    orders.arrival_time[:n] = arrival
+    orders.batch_id[:n] = batch_ids
+
+    ready = arrival
+    for station, machine in enumerate(machine_config.values()):
+        start, finish = station_times(ready, service[:, station], machine.capacity)
+        orders.enqueue_time[:n, station] = ready
+        orders.start_time[:n, station] = start
+        orders.finish_time[:n, station] = finish
+        ready = finish
+    orders.completion_time[:n] = ready
+    return orders
+
+def truncate(orders: OrderTable, end_time: float):
+    """Clear the times after `end_time`, as if the run had stopped there"""
+    n = orders.n_orders
+    for column in (orders.completion_time[:n], orders.enqueue_time[:n], orders.start_time[:n], orders.finish_time[:n]):
+        column[column >= end_time] = np.nan
+
+def get_end_time(orders: OrderTable, time_config: dict = config.TIME_CONFIG,
+                 system_config: dict = config.SYSTEM_CONFIG) -> float:
+    """Time the SimPy run stops: SIM_TIME, or earlier once the line has drained"""
+    if not config.TRACKING_CONFIG['STOP_WHEN_DRAINED']:
+        return time_config['SIM_TIME']
+    source_done = system_config['MAX_ORDERS'] * time_config['ARRIVAL_RATE']
+    last_completion = orders.completion_time[:orders.n_orders].max() if orders.n_orders else 0
+    return min(time_config['SIM_TIME'], max(source_done, last_completion))
+
+def summarize(orders: OrderTable, end_time: float, machine_config: dict = config.MACHINE_CONFIG) -> dict:
+    """Summary in the format of ManufacturingLineSimulation.get_summary_statistics"""
+    n = orders.n_orders
+    completed = int(orders.completed.sum())
+    revenue = completed * config.FINANCIAL_CONFIG['REVENUE_PER_ORDER']
+    costs = completed * config.FINANCIAL_CONFIG['COST_PER_ORDER']
+
+    # Busy servers integrated over [0, end_time]
+    utilization = {}
+    for station, (name, machine) in enumerate(machine_config.items()):
+        start = orders.start_time[:n, station]
+        started = ~np.isnan(start)
+        finish = np.fmin(orders.finish_time[:n, station][started], end_time)
+        busy = np.sum(finish - start[started])
+        utilization[name] = busy / (machine.capacity * end_time) * 100 if end_time > 0 else 0
+
+    lead_times = orders.lead_times()
+    flow_times = orders.flow_times()
+    waiting_times = [orders.waiting_times(station) for station in range(orders.n_stations)]
+    waiting_means = [times.mean() for times in waiting_times if len(times)]
+    return {
+        'Revenue, $': revenue,
+        'Manufacturing Costs, $': costs,
+        'Backlog, $': 0,
+        'Total Costs, $': costs,
+        'Profit, $': revenue - costs,
+        'Customer Orders': n,
+        'Output (orders)': completed,
+        'Backlog (orders)': 0,
+        'WIP (orders)': n - completed,
+        'Service Level, %': completed / n * 100 if n else 0,
+        'Unit Costs, $': costs / completed if completed else 0,
+        'Unit Profit, $': (revenue - costs) / completed if completed else 0,
+        'Mean Capacity Utilization': utilization,
+        'Average Waiting Customer times': np.mean(waiting_means) if waiting_means else 0,
+        'Average Lead Time': lead_times.mean() if len(lead_times) else 0,
+        'Lead Time Min': lead_times.min() if len(lead_times) else 0,
+        'Lead Time Max': lead_times.max() if len(lead_times) else 0,
+        'Lead Time Std Dev': lead_times.std() if len(lead_times) else 0,
+        'Lead Time Median': np.quantile(lead_times, 0.5) if len(lead_times) else 0,
+        'Lead Time P95': np.quantile(lead_times, 0.95) if len(lead_times) else 0,
+        'Average Flow Time': flow_times.mean() if len(flow_times) else 0,
+        'Flow Time Min': flow_times.min() if len(flow_times) else 0,
+        'Flow Time Max': flow_times.max() if len(flow_times) else 0,
+        'Flow Time Std Dev': flow_times.std() if len(flow_times) else 0,
+        'Flow Time Median': np.quantile(flow_times, 0.5) if len(flow_times) else 0,
+        'Flow Time P95': np.quantile(flow_times, 0.95) if len(flow_times) else 0,
+    }
+
+def generate_inputs(seed: int = None, machine_config: dict = config.MACHINE_CONFIG,
+                    time_config: dict = config.TIME_CONFIG, system_config: dict = config.SYSTEM_CONFIG):
+    """Draw arrival times, batch ids and processing times of a run"""
+    rng = np.random.default_rng(system_config['RANDOM_SEED'] if seed is None else seed)
+    arrival, batch_ids = generate_arrivals(rng, time_config, system_config)
+    return arrival, batch_ids, generate_service_times(rng, len(arrival), machine_config)
+
+def run_line(arrival: np.ndarray, batch_ids: np.ndarray, service: np.ndarray, machine_config: dict = config.MACHINE_CONFIG,
+             time_config: dict = config.TIME_CONFIG, system_config: dict = config.SYSTEM_CONFIG):
+    """Run the given inputs until the SimPy run would stop; returns the order table and end time"""
+    orders = simulate(arrival, batch_ids, service, machine_config)
+    end_time = get_end_time(orders, time_config, system_config)
+    truncate(orders, end_time)
+    return orders, end_time
+
+def run_simulation(seed: int = None, machine_config: dict = config.MACHINE_CONFIG,
+                   time_config: dict = config.TIME_CONFIG, system_config: dict = config.SYSTEM_CONFIG) -> dict:
+    """Run the push-mode line with the recursion engine; returns the summary statistics"""
+    inputs = generate_inputs(seed, machine_config, time_config, system_config)
+    orders, end_time = run_line(*inputs, machine_config, time_config, system_config)
+    return summarize(orders, end_time, machine_config)
+
+def check_consistency(seed: int = None) -> float:
+    """Run the engine and the SimPy path in push mode on the same draws; returns the largest deviation
+
+    The engine runs as in run_simulation. SimPy gets the engine's batch sizes, and
+    at every machine the processing times in the order the engine starts the
+    orders there. Per-order times and every summary value are compared, except the
+    medians and P95s, which SimPy estimates online; the per-order times cover them.
+    """
+    arrival, batch_ids, service = generate_inputs(seed)
+    orders, end_time = run_line(arrival, batch_ids, service)
+    expected = summarize(orders, end_time)
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'manufacturing-simulation.py')
+    spec = importlib.util.spec_from_file_location('manufacturing_simulation', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    import simpy
+    n = orders.n_orders
+    ids = np.arange(n)
+    batch_sizes = iter(np.bincount(batch_ids)[1:].tolist())
+    draws = {}
+    for station, name in enumerate(config.MACHINE_CONFIG):
+        # Start order at the machine; ties by arrival at its queue, then by id. Unstarted orders come last
+        started = np.lexsort((ids, orders.enqueue_time[:n, station], orders.start_time[:n, station]))
+        draws[name] = deque(service[started, station].tolist())
+
+    push, order_table = config.SYSTEM_CONFIG['PUSH_SYSTEM'], config.TRACKING_CONFIG['ORDER_TABLE']
+    get_batch_size, get_processing_time = config.get_batch_size, config.get_processing_time
+    config.SYSTEM_CONFIG['PUSH_SYSTEM'] = True
+    config.TRACKING_CONFIG['ORDER_TABLE'] = True
+    config.get_batch_size = lambda: next(batch_sizes)
+    config.get_processing_time = lambda machine: draws[machine].popleft()
+    try:
+        env = simpy.Environment()
+        simulation = module.ManufacturingLineSimulation(env)
+        env.process(simulation.order_source())
+        if config.TRACKING_CONFIG['STOP_WHEN_DRAINED']:
+            simulation.drained.callbacks.append(module.StopSimulation.callback)
+        env.run(until=config.TIME_CONFIG['SIM_TIME'])
+        actual = simulation.get_summary_statistics()
+    finally:
+        config.SYSTEM_CONFIG['PUSH_SYSTEM'] = push
+        config.TRACKING_CONFIG['ORDER_TABLE'] = order_table
+        config.get_batch_size, config.get_processing_time = get_batch_size, get_processing_time
+
+    recorded = simulation.orders
+    if recorded.n_orders != n or env.now != end_time:
+        return np.inf
+    deviation = 0.0
+    for name in ('arrival_time', 'completion_time', 'enqueue_time', 'start_time', 'finish_time'):
+        a, b = getattr(recorded, name)[:n], getattr(orders, name)[:n]
+        if not np.array_equal(np.isnan(a), np.isnan(b)):
+            return np.inf
+        deviation = max(deviation, np.nanmax(np.abs(a - b), initial=0))
+    for key, value in expected.items():
+        if key.endswith(('Median', 'P95')):
+            continue
+        if isinstance(value, dict):
+            deviation = max(deviation, max(abs(v - actual[key][k]) for k, v in value.items()))
+        else:
+            deviation = max(deviation, abs(value - actual[key]))
+    return deviation
+
+if __name__ == "__main__":
+    print(f"Largest deviation from the SimPy path: {check_consistency():.2e}")
+    results = run_simulation()
+    print("\nPush-mode line, recursion engine:")
+    for metric, value in results.items():
+        if isinstance(value, dict):
+            print(f"\n{metric}:")
+            for k, v in value.items():
+                print(f"  {k}: {v:.2f}")
+        else:
+            print(f"{metric}: {value:.2f}")
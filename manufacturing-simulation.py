@@ -1,11 +1,15 @@
 import simpy
+from simpy.core import StopSimulation
 import random
 import numpy as np
 import logging
-from dataclasses import dataclass
-from typing import List, Dict, Optional
-from collections import defaultdict
+from typing import Optional
 import config
+import tracing
+from accumulators import RunningStats, TimeWeighted
+from monitors import MonitoredResource, MonitoredStore
+from order_table import OrderTable
+from tracing import EventType
 
 # Configure the logging system
 logging.basicConfig(
@@ -14,47 +18,45 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-@dataclass
-class Order:
-    """Represents a manufacturing order in the system"""
-    id: int
-    arrival_time: float
-    batch_id: int
-    start_time: Optional[float] = None
-    completion_time: Optional[float] = None
-    current_machine: Optional[str] = None
-    withdrawn: bool = False
-
 class ManufacturingLineSimulation:
-    def __init__(self, env: simpy.Environment):
+    def __init__(self, env: simpy.Environment, tracer: Optional[tracing.Tracer] = None):
         self.env = env
+        # Per-order events go to the tracer instead of the log; check tracer.enabled before recording
+        self.tracer = tracer if tracer is not None else tracing.Tracer(enabled=False)
         self.order_counter = 0
         self.batch_counter = 0
         self.total_arrivals = 0
+        self.active_orders = 0  # order processes still running
+        self.source_done = False
+        self.drained = env.event()  # succeeds once all orders have left the system
+
+        # Processes and queues refer to orders by id; with ORDER_TABLE, the id is the order's row in the table
+        self.orders = OrderTable(len(config.MACHINE_CONFIG)) if config.TRACKING_CONFIG['ORDER_TABLE'] else None
         
-        # Create resources (machines)
+        # Create resources (machines), tracking busy servers over time
         self.machines = {
-            name: simpy.Resource(env, config.MACHINE_CONFIG[name].capacity)
+            name: MonitoredResource(env, config.MACHINE_CONFIG[name].capacity)
             for name in config.MACHINE_CONFIG
         }
         
-        # Create stores for queues with limited capacity
+        # Create stores for queues with limited capacity, tracking their length over time
         self.queues = {
-            name: simpy.Store(env, capacity=config.QUEUE_CONFIG[name].capacity)
+            name: MonitoredStore(env, capacity=config.QUEUE_CONFIG[name].capacity)
             for name in config.QUEUE_CONFIG
         }
         
-        # Statistics tracking
+        # Statistics tracking; per-order times go into online accumulators, so memory stays flat with run length.
+        # Queue lengths, busy servers and WIP are time-weighted and updated on every change, without polling
         self.stats = {
-            'queue_lengths': defaultdict(list),
-            'machine_utilization': defaultdict(list),
+            'queue_lengths': {name: queue.length for name, queue in self.queues.items()},
+            'machine_utilization': {name: machine.busy for name, machine in self.machines.items()},
+            'wip_level': TimeWeighted(0, env.now),
+            'waiting_times': {name: RunningStats() for name in self.queues},
+            'lead_times': RunningStats(quantiles=(0.5, 0.95)),
+            'flow_times': RunningStats(quantiles=(0.5, 0.95)),
             'completed_orders': 0,
             'blocked_orders': 0,
             'wip': 0,
-            'waiting_times': defaultdict(list),
-            'processing_times': defaultdict(list),
-            'lead_times': [],
-            'flow_times': [],
             'total_revenue': 0,
             'manufacturing_costs': 0,
             'opportunity_costs': 0,
@@ -65,14 +67,9 @@ class ManufacturingLineSimulation:
             'unit_profit': 0,
             'mean_capacity_utilization': 0,
             'average_waiting_customer_orders': 0,
-            'lead_time_summary': {'min': float('inf'), 'max': 0, 'avg': 0, 'std_dev': 0},
-            'flow_time_summary': {'min': float('inf'), 'max': 0, 'avg': 0, 'std_dev': 0},
 
         }
-        
-        # Start statistics collection
-        if config.TRACKING_CONFIG['COLLECT_QUEUE_STATS']:
-            env.process(self.collect_statistics())
+
 
         logging.info("Simulation initialized.")
 
@@ -83,39 +80,64 @@ class ManufacturingLineSimulation:
             self.batch_counter += 1
             
             for _ in range(batch_size):
-                order = Order(
-                    id=self.order_counter + 1,
-                    arrival_time=self.env.now,
-                    batch_id=self.batch_counter
-                )
+                order_id = self.order_counter
+                if self.orders is not None:
+                    self.orders.add(self.env.now, self.batch_counter)
                 self.order_counter += 1
                 self.total_arrivals += 1
-                self.stats['wip'] += 1
-                logging.debug(f"Order {order.id} created at time {order.arrival_time}.")
-                self.env.process(self.process_order(order))
+                self.active_orders += 1
+                self.update_wip(1)
+                if self.tracer.enabled:
+                    self.tracer.record(order_id, -1, EventType.CREATED, self.env.now)
+                self.env.process(self.process_order(order_id, self.env.now))
         
             yield self.env.timeout(config.TIME_CONFIG['ARRIVAL_RATE'])
 
-    def process_order(self, order):
+        self.source_done = True
+        self.check_drained()
+
+    def update_wip(self, change: int):
+        """Change the WIP count and its time-weighted level"""
+        self.stats['wip'] += change
+        self.stats['wip_level'].update(self.stats['wip'], self.env.now)
+
+    def check_drained(self):
+        """Signal `drained` once the source is done and no order is left"""
+        if self.source_done and self.active_orders == 0 and not self.drained.triggered:
+            self.drained.succeed()
+
+    def process_order(self, order_id: int, arrival_time: float):
         """Process an order through all machines."""
-        for machine_name in config.MACHINE_CONFIG:
-            order.current_machine = machine_name
+        orders = self.orders
+        for station, machine_name in enumerate(config.MACHINE_CONFIG):
             queue_name = f'Q{machine_name[1]}'
 
             # Push system: force the order into the queue regardless of capacity
             if config.SYSTEM_CONFIG['PUSH_SYSTEM']:
-                queue_start_time = self.env.now
-                self.queues[queue_name].items.append(order)  # Add order directly to queue
-                logging.debug(f"Order {order.id} pushed to {queue_name} at time {self.env.now}.")
+                enqueue_time = self.env.now
+                if orders is not None:
+                    orders.enqueue_time[order_id, station] = enqueue_time
+                self.queues[queue_name].push(order_id)  # Add order directly to queue
+                if self.tracer.enabled:
+                    self.tracer.record(order_id, station, EventType.ENQUEUED, self.env.now)
             else:  # Pull system: ensure the next stage has capacity before proceeding
                 if len(self.queues[queue_name].items) >= self.queues[queue_name].capacity:
                     self.stats['blocked_orders'] += 1
+                    if orders is not None:
+                        orders.blocked_at[order_id] = station
                     if queue_name == 'Q1':
-                        self.stats['wip'] -= 1
-                    logging.warning(f"Order {order.id} blocked at {machine_name}.")
+                        self.update_wip(-1)
+                    if self.tracer.enabled:
+                        self.tracer.record(order_id, station, EventType.BLOCKED, self.env.now)
+                    self.active_orders -= 1
+                    self.check_drained()
                     return
-                queue_start_time = self.env.now
-                yield self.queues[queue_name].put(order)
+                enqueue_time = self.env.now
+                if orders is not None:
+                    orders.enqueue_time[order_id, station] = enqueue_time
+                yield self.queues[queue_name].put(order_id)
+                if self.tracer.enabled:
+                    self.tracer.record(order_id, station, EventType.ENQUEUED, enqueue_time)
 
             with self.machines[machine_name].request() as request:
                 yield request
@@ -124,67 +146,53 @@ class ManufacturingLineSimulation:
                 if not config.SYSTEM_CONFIG['PUSH_SYSTEM']:
                     yield self.queues[queue_name].get()
 
-                wait_time = self.env.now - queue_start_time
-                if machine_name == 'M1':
-                    order.start_time = self.env.now
-                    logging.debug(f"Order {order.id} started processing at time {order.start_time}.")
-                self.stats['waiting_times'][queue_name].append(wait_time)
-                logging.debug(f"Order {order.id} waited {wait_time:.2f} at {queue_name}.")
+                self.stats['waiting_times'][queue_name].add(self.env.now - enqueue_time)
+                if station == 0:
+                    start_time = self.env.now
+                if orders is not None:
+                    orders.start_time[order_id, station] = self.env.now
+                if self.tracer.enabled:
+                    self.tracer.record(order_id, station, EventType.STARTED, self.env.now)
 
-                process_start_time = self.env.now
-                processing_time = config.get_processing_time(machine_name)
-                yield self.env.timeout(processing_time)
-                proc_time = self.env.now - process_start_time
-                self.stats['processing_times'][machine_name].append(proc_time)
-                logging.debug(f"Order {order.id} processed on {machine_name} in {proc_time:.2f}.")
+                yield self.env.timeout(config.get_processing_time(machine_name))
+                if orders is not None:
+                    orders.finish_time[order_id, station] = self.env.now
+                if self.tracer.enabled:
+                    self.tracer.record(order_id, station, EventType.FINISHED, self.env.now)
 
-        order.completion_time = self.env.now
-        self.process_completed_order(order)
+        if orders is not None:
+            orders.completion_time[order_id] = self.env.now
+        self.process_completed_order(order_id, arrival_time, start_time)
+        self.active_orders -= 1
+        self.check_drained()
 
 
-    def process_completed_order(self, order):
+    def process_completed_order(self, order_id: int, arrival_time: float, start_time: float):
         """Handle completion of an order"""
         self.stats['completed_orders'] += 1
-        self.stats['wip'] -= 1
-        
-        lead_time = order.completion_time - order.arrival_time
-        flow_time = order.completion_time - order.start_time
+        self.update_wip(-1)
 
-        self.stats['lead_times'].append(lead_time)
-        self.stats['flow_times'].append(flow_time)
+        self.stats['lead_times'].add(self.env.now - arrival_time)
+        self.stats['flow_times'].add(self.env.now - start_time)
         
         self.stats['total_revenue'] += config.FINANCIAL_CONFIG['REVENUE_PER_ORDER']
         self.stats['manufacturing_costs'] += config.FINANCIAL_CONFIG['COST_PER_ORDER']
-        
-        logging.info(
-            f"Order {order.id} completed at {order.completion_time:.2f}. "
-            f"Lead time: {lead_time:.2f}, Flow time: {flow_time:.2f}."
-        )
-
-    def collect_statistics(self):
-        """Collect periodic statistics about the system"""
-        while True:
-            self.stats['backlog_costs']=0
-            for queue_name, queue in self.queues.items():
-                queue_length = len(queue.items)
-                self.stats['queue_lengths'][queue_name].append(queue_length)
 
-            
-            for machine_name, machine in self.machines.items():
-                utilization = machine.count / machine.capacity if machine.capacity > 0 else 0
-                self.stats['machine_utilization'][machine_name].append(utilization)
-                self.stats['mean_capacity_utilization'] = {
-                                    machine_name: np.mean(utilization)
-                                    for machine_name, utilization in self.stats['machine_utilization'].items()
-                                }
-            self.stats['inventory_costs'] += self.stats['wip'] * config.FINANCIAL_CONFIG['INVENTORY_COST_PER_UNIT']
-            yield self.env.timeout(config.TRACKING_CONFIG['STATS_COLLECTION_INTERVAL'])
+        if self.tracer.enabled:
+            self.tracer.record(order_id, -1, EventType.COMPLETED, self.env.now)
 
     def get_summary_statistics(self):
         """Calculate and return summary statistics"""
         logging.info("Calculating summary statistics.")
         self.stats['backlog_costs'] += config.FINANCIAL_CONFIG['BACKLOG_COST_PER_UNIT']*self.stats['blocked_orders']
         self.stats['total_costs'] = self.stats['manufacturing_costs'] + self.stats['backlog_costs']
+        self.stats['inventory_costs'] = self.stats['wip_level'].integral(self.env.now) * config.FINANCIAL_CONFIG['INVENTORY_COST_PER_UNIT']
+        self.stats['mean_capacity_utilization'] = {
+            name: machine.utilization(self.env.now) for name, machine in self.machines.items()
+        }
+        lead_times = self.stats['lead_times']
+        flow_times = self.stats['flow_times']
+        waiting_means = [times.mean for times in self.stats['waiting_times'].values() if times]
         summary = {
                 'Revenue, $': self.stats['total_revenue'],
                 'Manufacturing Costs, $': self.stats['manufacturing_costs'],
@@ -202,20 +210,22 @@ class ManufacturingLineSimulation:
                     if self.stats['completed_orders'] else 0
                 ),
                 'Mean Capacity Utilization': {
-                    machine: np.mean(utilization) * 100
-                    for machine, utilization in self.stats['machine_utilization'].items()
+                    machine: utilization * 100
+                    for machine, utilization in self.stats['mean_capacity_utilization'].items()
                 },
-                'Average Waiting Customer times': np.mean([
-                    np.mean(wait_times) for wait_times in self.stats['waiting_times'].values()
-                ]) if self.stats['waiting_times'] else 0,
-                'Average Lead Time': np.mean(self.stats['lead_times']) if self.stats['lead_times'] else 0,
-                'Lead Time Min': min(self.stats['lead_times']) if self.stats['lead_times'] else 0,
-                'Lead Time Max': max(self.stats['lead_times']) if self.stats['lead_times'] else 0,
-                'Lead Time Std Dev': np.std(self.stats['lead_times']) if self.stats['lead_times'] else 0,
-                'Average Flow Time': np.mean(self.stats['flow_times']) if self.stats['flow_times'] else 0,
-                'Flow Time Min': min(self.stats['flow_times']) if self.stats['flow_times'] else 0,
-                'Flow Time Max': max(self.stats['flow_times']) if self.stats['flow_times'] else 0,
-                'Flow Time Std Dev': np.std(self.stats['flow_times']) if self.stats['flow_times'] else 0,
+                'Average Waiting Customer times': np.mean(waiting_means) if waiting_means else 0,
+                'Average Lead Time': lead_times.mean,
+                'Lead Time Min': lead_times.min if lead_times else 0,
+                'Lead Time Max': lead_times.max if lead_times else 0,
+                'Lead Time Std Dev': lead_times.std,
+                'Lead Time Median': lead_times.quantile(0.5),
+                'Lead Time P95': lead_times.quantile(0.95),
+                'Average Flow Time': flow_times.mean,
+                'Flow Time Min': flow_times.min if flow_times else 0,
+                'Flow Time Max': flow_times.max if flow_times else 0,
+                'Flow Time Std Dev': flow_times.std,
+                'Flow Time Median': flow_times.quantile(0.5),
+                'Flow Time P95': flow_times.quantile(0.95),
             }
 
         return summary
@@ -230,13 +240,21 @@ def run_simulation():
     env = simpy.Environment()
     
     # Create and set up simulation
-    simulation = ManufacturingLineSimulation(env)
+    tracer = tracing.from_config(config.TRACING_CONFIG)
+    simulation = ManufacturingLineSimulation(env, tracer)
     
     # Start order generation
     env.process(simulation.order_source())
+
+    # Stop as soon as every order has left the system
+    if config.TRACKING_CONFIG['STOP_WHEN_DRAINED']:
+        simulation.drained.callbacks.append(StopSimulation.callback)
     
     # Run simulation
     env.run(until=config.TIME_CONFIG['SIM_TIME'])
+
+    if tracer.enabled and config.TRACING_CONFIG['DUMP_PATH']:
+        tracer.dump(config.TRACING_CONFIG['DUMP_PATH'])
     
     return simulation.get_summary_statistics()
 
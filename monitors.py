@@ -0,0 +1,41 @@
+import simpy
+from accumulators import TimeWeighted
+
+class MonitoredResource(simpy.Resource):
+    """Resource that tracks the time-weighted number of busy servers"""
+
+    def __init__(self, env: simpy.Environment, capacity: int = 1):
+        super().__init__(env, capacity)
+        self.busy = TimeWeighted(0, env.now)
+
+    def _do_put(self, event):
+        super()._do_put(event)
+        self.busy.update(len(self.users), self._env.now)
+
+    def _do_get(self, event):
+        super()._do_get(event)
+        self.busy.update(len(self.users), self._env.now)
+
+    def utilization(self, time: float) -> float:
+        """Mean share of busy servers from the start until `time`"""
+        return self.busy.mean(time) / self.capacity if self.capacity > 0 else 0
+
+class MonitoredStore(simpy.Store):
+    """Store that tracks the time-weighted number of items"""
+
+    def __init__(self, env: simpy.Environment, capacity: float = float('inf')):
+        super().__init__(env, capacity)
+        self.length = TimeWeighted(0, env.now)
+
+    def _do_put(self, event):
+        super()._do_put(event)
+        self.length.update(len(self.items), self._env.now)
+
+    def _do_get(self, event):
+        super()._do_get(event)
+        self.length.update(len(self.items), self._env.now)
+
+    def push(self, item):
+        """Add an item immediately, ignoring the capacity (push systems)"""
+        self.items.append(item)
+        self.length.update(len(self.items), self._env.now)
@@ -0,0 +1,85 @@
+import numpy as np
+
+# Column names and the value of unset entries
+COLUMN_FILLS = {
+    'arrival_time': np.nan,
+    'completion_time': np.nan,
+    'batch_id': 0,
+    'blocked_at': -1,
+    'enqueue_time': np.nan,
+    'start_time': np.nan,
+    'finish_time': np.nan,
+}
+
+class OrderTable:
+    """Preallocated struct-of-arrays table of orders, indexed by integer order id
+
+    Every order is one row. Per-station times are columns of (order, station)
+    arrays, and times that did not happen (yet) are NaN. The table doubles its
+    capacity when full. KPIs are computed as column operations over the table.
+    """
+
+    def __init__(self, n_stations: int, capacity: int = 1024):
+        self.n_stations = n_stations
+        self.n_orders = 0
+        self.arrival_time = np.full(capacity, np.nan)
+        self.completion_time = np.full(capacity, np.nan)
+        self.batch_id = np.zeros(capacity, dtype=np.int32)
+        self.blocked_at = np.full(capacity, -1, dtype=np.int8)  # station index, -1 if not blocked
+        self.enqueue_time = np.full((capacity, n_stations), np.nan)
+        self.start_time = np.full((capacity, n_stations), np.nan)
+        self.finish_time = np.full((capacity, n_stations), np.nan)
+
+    def _grow(self):
+        """Double the capacity, keeping the recorded rows"""
+        for name, fill in COLUMN_FILLS.items():
+            column = getattr(self, name)
+            grown = np.full((2 * len(column),) + column.shape[1:], fill, dtype=column.dtype)
+            grown[:self.n_orders] = column[:self.n_orders]
+            setattr(self, name, grown)
+
+    def add(self, arrival_time: float, batch_id: int) -> int:
+        """Add an order and return its id"""
+        if self.n_orders == len(self.arrival_time):
+            self._grow()
+        order_id = self.n_orders
+        self.arrival_time[order_id] = arrival_time
+        self.batch_id[order_id] = batch_id
+        self.n_orders += 1
+        return order_id
+
+    def __len__(self) -> int:
+        return self.n_orders
+
+    @property
+    def completed(self) -> np.ndarray:
+        """Boolean mask of the completed orders"""
+        return ~np.isnan(self.completion_time[:self.n_orders])
+
+    def lead_times(self) -> np.ndarray:
+        """Completion minus arrival time of the completed orders"""
+        n = self.n_orders
+        done = self.completed
+        return self.completion_time[:n][done] - self.arrival_time[:n][done]
+
+    def flow_times(self, first_station: int = 0) -> np.ndarray:
+        """Completion time minus the start time at `first_station` for the completed orders"""
+        n = self.n_orders
+        done = self.completed
+        return self.completion_time[:n][done] - self.start_time[:n, first_station][done]
+
+    def waiting_times(self, station: int) -> np.ndarray:
+        """Start minus enqueue time at a station, for the orders started there"""
+        start = self.start_time[:self.n_orders, station]
+        started = ~np.isnan(start)
+        return start[started] - self.enqueue_time[:self.n_orders, station][started]
+
+    def processing_times(self, station: int) -> np.ndarray:
+        """Finish minus start time at a station, for the orders finished there"""
+        finish = self.finish_time[:self.n_orders, station]
+        finished = ~np.isnan(finish)
+        return finish[finished] - self.start_time[:self.n_orders, station][finished]
+
+    def nbytes(self) -> int:
+        """Memory held by the table columns"""
+        return sum(getattr(self, name).nbytes for name in COLUMN_FILLS)
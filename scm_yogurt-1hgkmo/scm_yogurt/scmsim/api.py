@@ -1,13 +1,16 @@
 import simpy
+import itertools
+import statistics
+import warnings
 import pandas as pd
-from collections import deque
 
-#import framework.demand as demand
-import scmsim.framework.demand         as demand
-import scmsim.framework.supply         as supply
-import scmsim.framework.warehousing    as warehousing
 import scmsim.framework.inventory      as inventory
-import scmsim.framework.manufacturing  as manufacturing
+import scmsim.framework.recording      as recording
+import scmsim.kernel                   as kernel
+import scmsim.parallel                 as parallel
+import scmsim.utils                    as utils
+import scmsim.model                    as model
+import numpy as np
 
 def run(
          mfgqty_mu            :float,
@@ -28,80 +31,553 @@ def run(
          l_supplyprodgroups  :list,
          l_supplyprodshares  :list,
          l_deliveryleadtimes :list,
-         simlength           :int
-         ): # -> pandas.DataFrame
+         simlength           :int,
+         inventorybackend    :str = "units", # "units" (one Product per unit) or "cohorts" (counts per expiry cohort), both fifo; or "fefo", "lifo", "youngest"
+         batched             :bool = False, # if true, warehouses sample and fill purchases and demand as quantities per group
+         result_mode         :str = "units", # "units", "aggregated", "arrow" or "kpi"
+         seed                :int = None, # master seed; None draws fresh entropy
+         allocation_rule     :str = "preference", # batched demand allocation, "preference" or "minimize_reserved"
+         env                 :simpy.Environment = None, # environment to run in, e.g. an instrumented one; None creates one
+         demandtrace         :object = None, # replay.NumpyTrace or replay.ArrowTrace (see replay.load_trace) replacing sampled demand
+         supplytrace         :object = None, # trace replacing sampled warehouse purchases
+         productiontrace     :object = None, # trace replacing sampled production
+         l_tracesites        :list = None,   # per warehouse, its site in the traces, or None to keep sampling
+         tracestart          :int = 0,       # trace day replayed on simulation day 0
+         rationing           :str = None,    # batched only: "random", "proportional" or "priority" daily allocation phase
+         l_priorities        :list = None,   # per warehouse, for rationing "priority", lower is served first
+         d_inventorybackends :dict = None,   # key: entity, e.g. "warehouse 2", value: inventory backend overriding inventorybackend
+         store               :object = None, # traceability.TraceabilityStore to record every units lifecycle in, queryable after the run
+         fluidvolume         :float = None   # batched only: expected daily units per warehouse from which a group is tracked as a continuous flow
+         ): # -> pandas.DataFrame or pyarrow.Table
     """
     
     API encapsulating simulation applicaiton, returning results
 
-    returns:
-    - pandas.DataFrame with simulation results
+    returns, depending on result_mode:
+    - "units": pandas.DataFrame with one row per unit sales order
+    - "aggregated": pandas.DataFrame with unit counts (column qty) per day, entity, preference, product and fulfillment
+    - "arrow": pyarrow.Table with one row per unit sales order and dictionary-encoded entity, preference and product
+    - "kpi": pandas.DataFrame with one row per entity and group: units demanded, fulfilled, fulfilled by substitute, 
+      short and outdated, fill rate and average age at issue; demand is counted by first choice, outdated units by product group
+
+    aggregated, arrow and kpi results are accumulated during the run, sales orders are not kept;
+    arrow rows are in order of occurrence rather than grouped by entity
+
+    every entity draws from its own stream derived from seed and its id (utils.get_stream),
+    so runs are reproducible and scenarios differing only in e.g. leadtimes or lifetime see the same demand draws
+
+    traces replay recorded daily quantities per site and group instead of sampling them (framework.replay);
+    by default warehouse i replays site i-1, with None entries in l_tracesites those warehouses sample (mixed mode)
+
+    with rationing, each day runs in fixed phases (production, all purchase requests, one rationed allocation of the 
+    manufacturers stock, receipts and demand) as one event, instead of warehouses reaching the manufacturer at jittered times
+
+    with fluidvolume, groups purchased in high volumes are tracked as continuous age distributions (fractional quantities)
+    and low-volume groups stay discrete; quantities in the result are then fractional, so only "aggregated" and "kpi" apply
 
     """
 
-    env = simpy.Environment()
-
-    # setup supplying manufacturers
-    s = manufacturing.Manufacturer(
-                                id = 1,
-                                env = env, 
-                                qty_mu= mfgqty_mu, 
-                                qty_sigma= mfgqty_sigma,
-                                gaussian =  mfg_normal,
-                                l_groups= l_mfggroups, 
-                                l_probs= l_mfgshares, 
-                                shelflife= inventory.ShelfLife(lifetime= lifetime)
-                                )
-    env.process(s.production())
-
-    # setup end-warehouses
-    whs = []
-    for i_wh in range(n_warehouses):
-
-        dm = demand.DemandPattern(
-                                qty_mu= dmndqty_mu, 
-                                qty_sigma= dmndqty_sigma,
-                                gaussian = dmnd_normal, 
-                                l_preferences= l_dmndprefs, 
-                                l_probs= l_dmndprefprobs
-                                )
-        
-        sm = supply.SupplyPattern(
-                                supplier= s, 
-                                qty_mu= supplierqty_mu,
-                                qty_sigma= supplierqty_sigma,
-                                gaussian = supplier_normal,  
-                                l_groups= l_supplyprodgroups, 
-                                l_probs= l_supplyprodshares
-                                )
+    for trace in (demandtrace, supplytrace, productiontrace):
 
-        wh = warehousing.Warehouse(
-                                id = i_wh+1,
-                                env= env, 
-                                demandmodel= dm, 
-                                supplymodel= sm, 
-                                leadtime= l_deliveryleadtimes[i_wh]
-                                )
+        if trace is not None and trace.n_days < tracestart + simlength:
+
+            raise ValueError(f"trace covers {trace.n_days} days, {tracestart + simlength} needed")
+
+    if result_mode != "units" and result_mode not in recording.d_recorders:
 
-        env.process(wh.warehousing())
+        raise ValueError(f"unknown result mode: {result_mode}, choose from {['units'] + list(recording.d_recorders)}")
 
-        whs.append(wh)
+    if fluidvolume is not None and result_mode not in ("aggregated", "kpi"):
+
+        raise ValueError(f"result mode {result_mode} counts whole units, with fluidvolume choose from ['aggregated', 'kpi']")
+
+    recorder = recording.d_recorders[result_mode]() if result_mode in recording.d_recorders else None
+
+    env, s, whs = model.build_model(
+                            mfgqty_mu= mfgqty_mu,
+                            mfgqty_sigma= mfgqty_sigma,
+                            mfg_normal= mfg_normal,
+                            l_mfggroups= l_mfggroups,
+                            l_mfgshares= l_mfgshares,
+                            lifetime= lifetime,
+                            dmndqty_mu= dmndqty_mu,
+                            dmndqty_sigma= dmndqty_sigma,
+                            dmnd_normal= dmnd_normal,
+                            l_dmndprefs= l_dmndprefs,
+                            l_dmndprefprobs= l_dmndprefprobs,
+                            n_warehouses= n_warehouses,
+                            supplierqty_mu= supplierqty_mu,
+                            supplierqty_sigma= supplierqty_sigma,
+                            supplier_normal= supplier_normal,
+                            l_supplyprodgroups= l_supplyprodgroups,
+                            l_supplyprodshares= l_supplyprodshares,
+                            l_deliveryleadtimes= l_deliveryleadtimes,
+                            inventorybackend= inventorybackend,
+                            batched= batched,
+                            seed= seed,
+                            allocation_rule= allocation_rule,
+                            recorder= recorder,
+                            env= env,
+                            demandtrace= demandtrace,
+                            supplytrace= supplytrace,
+                            productiontrace= productiontrace,
+                            l_tracesites= l_tracesites,
+                            tracestart= tracestart,
+                            rationing= rationing,
+                            l_priorities= l_priorities,
+                            d_inventorybackends= d_inventorybackends,
+                            store= store,
+                            fluidvolume= fluidvolume
+                            )
 
     # run simulation
     env.run(until= simlength)
 
+    if result_mode == "aggregated":
+
+        return recorder.to_frame()
+    
+    if result_mode == "arrow":
+
+        return recorder.to_table()
+
+    if result_mode == "kpi":
+
+        for e in [s] + whs:
+
+            recorder.record_outdated(entity= str(e), d_outdated= e.inventory.d_outdated)
+
+        return recorder.to_frame()
+
     # write simulation results and return as pandas dataframe
     
     data = []
     
     for so in s.l_processedorders:
 
-        data.append([str(s), so.date, str(so.t_pref), str(so.product), so.fulfilled])
+        data.append([str(s), so.date, str(so.t_pref), str(so.product), so.fulfilled, so.qty])
 
     for wh in whs:
 
         for so in wh.l_processedorders:
 
-            data.append([str(wh), so.date, str(so.t_pref), str(so.product), so.fulfilled])
+            data.append([str(wh), so.date, str(so.t_pref), str(so.product), so.fulfilled, so.qty])
+
+    df = pd.DataFrame(data, columns= ["entity", "time", "preference", "product", "fulfilled", "qty"])
+
+    # batched sales orders cover several units; expand them to one row per unit
+    if batched:
+
+        df = df.loc[df.index.repeat(df["qty"])].reset_index(drop= True)
+
+    return df.drop(columns= ["qty"])
+
+def iter_run(
+         mfgqty_mu            :float,
+         mfgqty_sigma        :float,
+         mfg_normal          :bool, # if false, then log normal
+         l_mfggroups         :list,
+         l_mfgshares         :list,
+         lifetime            :int,
+         dmndqty_mu          :float,
+         dmndqty_sigma       :float,
+         dmnd_normal         :bool, # if false, then log normal
+         l_dmndprefs         :list,
+         l_dmndprefprobs     :list,
+         n_warehouses        :int,
+         supplierqty_mu      :float,
+         supplierqty_sigma   :float,
+         supplier_normal     :bool, # if false, then log normal
+         l_supplyprodgroups  :list,
+         l_supplyprodshares  :list,
+         l_deliveryleadtimes :list,
+         simlength           :int,
+         inventorybackend    :str = "units",
+         batched             :bool = False,
+         seed                :int = None,
+         allocation_rule     :str = "preference"
+         ): # -> generator of recording.DaySnapshot
+    """
+    
+    same model as run, advanced one day per iteration; 
+    yields a recording.DaySnapshot per day with stock per group, fulfilled, unfulfilled and outdated units per entity
+
+    sales orders are only counted, so memory stays constant regardless of simlength;
+    callers may stop iterating at any time
+
+    """
+
+    recorder = recording.CountRecorder()
+
+    env, s, whs = model.build_model(
+                            mfgqty_mu= mfgqty_mu,
+                            mfgqty_sigma= mfgqty_sigma,
+                            mfg_normal= mfg_normal,
+                            l_mfggroups= l_mfggroups,
+                            l_mfgshares= l_mfgshares,
+                            lifetime= lifetime,
+                            dmndqty_mu= dmndqty_mu,
+                            dmndqty_sigma= dmndqty_sigma,
+                            dmnd_normal= dmnd_normal,
+                            l_dmndprefs= l_dmndprefs,
+                            l_dmndprefprobs= l_dmndprefprobs,
+                            n_warehouses= n_warehouses,
+                            supplierqty_mu= supplierqty_mu,
+                            supplierqty_sigma= supplierqty_sigma,
+                            supplier_normal= supplier_normal,
+                            l_supplyprodgroups= l_supplyprodgroups,
+                            l_supplyprodshares= l_supplyprodshares,
+                            l_deliveryleadtimes= l_deliveryleadtimes,
+                            inventorybackend= inventorybackend,
+                            batched= batched,
+                            seed= seed,
+                            allocation_rule= allocation_rule,
+                            recorder= recorder
+                            )
+
+    entities = [s] + whs
+    d_outdated = {str(e): 0 for e in entities}
+
+    for day in range(simlength):
+
+        env.run(until= day + 1)
+
+        snapshot = recording.DaySnapshot(
+                                day= day,
+                                d_stock= {str(e): {g: invgroup.qty for g, invgroup in e.inventory.d_invgroups.items()} for e in entities},
+                                d_fulfilled= dict(recorder.d_fulfilled),
+                                d_unfulfilled= dict(recorder.d_unfulfilled),
+                                d_outdated= {str(e): e.inventory.qty_outdated - d_outdated[str(e)] for e in entities}
+                                )
+
+        d_outdated = {str(e): e.inventory.qty_outdated for e in entities}
+        recorder.reset()
+
+        yield snapshot
+
+def run_daystep(
+         mfgqty_mu            :float,
+         mfgqty_sigma        :float,
+         mfg_normal          :bool, # if false, then log normal
+         l_mfggroups         :list,
+         l_mfgshares         :list,
+         lifetime            :int,
+         dmndqty_mu          :float,
+         dmndqty_sigma       :float,
+         dmnd_normal         :bool, # if false, then log normal
+         l_dmndprefs         :list,
+         l_dmndprefprobs     :list,
+         n_warehouses        :int,
+         supplierqty_mu      :float,
+         supplierqty_sigma   :float,
+         supplier_normal     :bool, # if false, then log normal
+         l_supplyprodgroups  :list,
+         l_supplyprodshares  :list,
+         l_deliveryleadtimes :list,
+         simlength           :int,
+         seed                :int = None,
+         allocation_rule     :str = "preference" # "preference" or "minimize_reserved"
+         ) -> pd.DataFrame:
+    """
+    
+    same model as run, advanced by the SimPy-free day-stepping kernel on arrays of cohort counts;
+    much faster for long horizons and many warehouses, results are statistically equivalent to run
+
+    returns:
+    - pandas.DataFrame in the format of run(result_mode= "aggregated")
+
+    """
+
+    k = kernel.DayStepKernel(
+                            mfgqty_mu= mfgqty_mu,
+                            mfgqty_sigma= mfgqty_sigma,
+                            mfg_normal= mfg_normal,
+                            l_mfggroups= l_mfggroups,
+                            l_mfgshares= l_mfgshares,
+                            lifetime= lifetime,
+                            dmndqty_mu= dmndqty_mu,
+                            dmndqty_sigma= dmndqty_sigma,
+                            dmnd_normal= dmnd_normal,
+                            l_dmndprefs= l_dmndprefs,
+                            l_dmndprefprobs= l_dmndprefprobs,
+                            n_warehouses= n_warehouses,
+                            supplierqty_mu= supplierqty_mu,
+                            supplierqty_sigma= supplierqty_sigma,
+                            supplier_normal= supplier_normal,
+                            l_supplyprodgroups= l_supplyprodgroups,
+                            l_supplyprodshares= l_supplyprodshares,
+                            l_deliveryleadtimes= l_deliveryleadtimes,
+                            rng= np.random.default_rng(seed),
+                            allocation_rule= allocation_rule
+                            )
+    
+    k.run(simlength= simlength)
+
+    return k.to_frame()
+
+
+def run_sweep(
+         mfgqty_mu           :float,
+         mfgqty_sigma        :float,
+         mfg_normal          :bool, # if false, then log normal
+         l_mfggroups         :list,
+         l_mfgshares         :list,
+         lifetime            :int,
+         dmndqty_mu          :float,
+         dmndqty_sigma       :float,
+         dmnd_normal         :bool, # if false, then log normal
+         l_dmndprefs         :list,
+         l_dmndprefprobs     :list,
+         n_warehouses        :int,
+         supplierqty_mu      :float,
+         supplierqty_sigma   :float,
+         supplier_normal     :bool, # if false, then log normal
+         l_supplyprodgroups  :list,
+         l_supplyprodshares  :list,
+         l_deliveryleadtimes :list,
+         simlength           :int,
+         d_sweep             :dict, # key: parameter name, value: list of values, e.g. {"lifetime": [35, 42], "l_deliveryleadtimes": [[7, 7, 7], [3, 7, 7]]}
+         n_replications      :int = 1,
+         seed                :int = None,
+         allocation_rule     :str = "preference"
+         ) -> pd.DataFrame:
+    """
+    
+    runs every combination of the values in d_sweep, n_replications times each, as one batch of the day-stepping kernel;
+    parameters not in d_sweep keep the given value
+
+    returns:
+    - pandas.DataFrame with run totals per scenario, replication and entity (see kernel.DayStepKernel.to_summary),
+      with one column per swept parameter
+
+    """
+
+    d_params = dict(
+                    mfgqty_mu= mfgqty_mu,
+                    mfgqty_sigma= mfgqty_sigma,
+                    lifetime= lifetime,
+                    dmndqty_mu= dmndqty_mu,
+                    dmndqty_sigma= dmndqty_sigma,
+                    supplierqty_mu= supplierqty_mu,
+                    supplierqty_sigma= supplierqty_sigma,
+                    l_deliveryleadtimes= l_deliveryleadtimes
+                    )
+
+    for param in d_sweep:
+
+        if param not in d_params:
+
+            raise ValueError(f"parameter {param} cannot be swept, choose from {list(d_params)}")
+
+    l_scenarios = list(itertools.product(*d_sweep.values()))
+    n_batch     = len(l_scenarios)*n_replications
+
+    # batch member b is scenario b // n_replications, replication b % n_replications
+    for i_param, param in enumerate(d_sweep):
+
+        d_params[param] = np.repeat(np.array([scenario[i_param] for scenario in l_scenarios], dtype= float), n_replications, axis= 0)
+
+    k = kernel.DayStepKernel(
+                            mfg_normal= mfg_normal,
+                            l_mfggroups= l_mfggroups,
+                            l_mfgshares= l_mfgshares,
+                            dmnd_normal= dmnd_normal,
+                            l_dmndprefs= l_dmndprefs,
+                            l_dmndprefprobs= l_dmndprefprobs,
+                            n_warehouses= n_warehouses,
+                            supplier_normal= supplier_normal,
+                            l_supplyprodgroups= l_supplyprodgroups,
+                            l_supplyprodshares= l_supplyprodshares,
+                            n_batch= n_batch,
+                            rng= np.random.default_rng(seed),
+                            allocation_rule= allocation_rule,
+                            keep_days= False,
+                            **d_params
+                            )
+
+    k.run(simlength= simlength)
+
+    df = k.to_summary()
+
+    a_batch = df["batch"].to_numpy()
+    df.insert(0, "replication", a_batch % n_replications)
+    df.insert(0, "scenario", a_batch // n_replications)
+
+    for i_param, param in enumerate(d_sweep):
+
+        df.insert(2 + i_param, param, [str(l_scenarios[i][i_param]) if isinstance(l_scenarios[i][i_param], (list, tuple)) else l_scenarios[i][i_param] for i in df["scenario"]])
+
+    return df.drop(columns= ["batch"])
+
+def run_rareevent(
+         mfgqty_mu           :float,
+         mfgqty_sigma        :float,
+         mfg_normal          :bool, # if false, then log normal
+         l_mfggroups         :list,
+         l_mfgshares         :list,
+         lifetime            :int,
+         dmndqty_mu          :float,
+         dmndqty_sigma       :float,
+         dmnd_normal         :bool, # if false, then log normal
+         l_dmndprefs         :list,
+         l_dmndprefprobs     :list,
+         n_warehouses        :int,
+         supplierqty_mu      :float,
+         supplierqty_sigma   :float,
+         supplier_normal     :bool, # if false, then log normal
+         l_supplyprodgroups  :list,
+         l_supplyprodshares  :list,
+         l_deliveryleadtimes :list,
+         simlength           :int,
+         d_tilts             :dict, # key: "mfg", "dmnd" or "supplier", value: shift of the underlying standard normal, e.g. {"dmnd": 0.5, "mfg": -0.5}
+         n_replications      :int = 1000,
+         seed                :int = None,
+         allocation_rule     :str = "preference",
+         confidence          :float = 0.95,
+         min_essshare        :float = 0.1 # warn when the effective sample size is below this share of n_replications
+         ) -> pd.DataFrame:
+    """
+    
+    estimates stock-out probabilities per warehouse and first-choice group by importance sampling:
+    replications run on the day-stepping kernel with tilted quantity draws (exponential twisting of the normal 
+    underlying each draw), and every stock-out is weighted by the likelihood ratio of the untilted model up to its day;
+    tilts that push towards stock-outs (more demand, less production) make rare stock-outs frequent,
+    while the weighting keeps the estimates unbiased; with d_tilts= {} this is plain Monte Carlo
+
+    the likelihood ratio is a product over all draws of the horizon, so its variance grows with tilt and simlength;
+    ess (effective sample size of the final weights) far below n_replications signals a tilt too strong for the horizon,
+    and a RuntimeWarning is raised when it is below min_essshare*n_replications
+
+    probabilities and upper bounds are clipped to 1 and lower bounds to 0, since single weighted estimates can leave [0, 1]
+
+    returns:
+    - pandas.DataFrame per warehouse and group: p_day (probability of a stock-out on a day), 
+      p_any (probability of at least one stock-out day within simlength), their standard errors and confidence bounds, and ess
+
+    """
+
+    k = kernel.DayStepKernel(
+                            mfgqty_mu= mfgqty_mu,
+                            mfgqty_sigma= mfgqty_sigma,
+                            mfg_normal= mfg_normal,
+                            l_mfggroups= l_mfggroups,
+                            l_mfgshares= l_mfgshares,
+                            lifetime= lifetime,
+                            dmndqty_mu= dmndqty_mu,
+                            dmndqty_sigma= dmndqty_sigma,
+                            dmnd_normal= dmnd_normal,
+                            l_dmndprefs= l_dmndprefs,
+                            l_dmndprefprobs= l_dmndprefprobs,
+                            n_warehouses= n_warehouses,
+                            supplierqty_mu= supplierqty_mu,
+                            supplierqty_sigma= supplierqty_sigma,
+                            supplier_normal= supplier_normal,
+                            l_supplyprodgroups= l_supplyprodgroups,
+                            l_supplyprodshares= l_supplyprodshares,
+                            l_deliveryleadtimes= l_deliveryleadtimes,
+                            n_batch= n_replications,
+                            rng= np.random.default_rng(seed),
+                            allocation_rule= allocation_rule,
+                            keep_days= False,
+                            d_tilts= d_tilts
+                            )
+
+    k.run(simlength= simlength)
+
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence/2)
+
+    # likelihood ratios are exponentiated relative to their maximum (log-sum-exp), so long horizons or strong tilts 
+    # neither overflow nor underflow; the ess is scale free, the estimates are scaled back afterwards
+    a_weights = np.exp(k.a_loglr - k.a_loglr.max())
+    ess = a_weights.sum()**2/(a_weights**2).sum()
+
+    if ess < min_essshare*n_replications:
+
+        warnings.warn(f"effective sample size {ess:.0f} of {n_replications} replications, estimates are unreliable; reduce the tilts or simlength", RuntimeWarning)
+
+    d_columns = {}
+
+    for name, a_logsamples, scale in (("p_day", k.a_logstockoutdays, 1/simlength), ("p_any", k.a_logstockoutfirst, 1)):
+
+        a_shift   = a_logsamples.max(axis= 0)
+        a_shift   = np.where(np.isfinite(a_shift), a_shift, 0) # no stock-outs: all samples are 0
+        a_samples = np.exp(a_logsamples - a_shift)
+        a_scale   = np.exp(a_shift)*scale
+
+        a_mean = a_samples.mean(axis= 0)*a_scale
+        a_se   = a_samples.std(axis= 0, ddof= 1)*a_scale/np.sqrt(n_replications) if n_replications > 1 else np.full_like(a_mean, np.nan)
+
+        d_columns[name]            = np.minimum(a_mean, 1).ravel()
+        d_columns[f"{name}_se"]    = a_se.ravel()
+        d_columns[f"{name}_low"]   = np.clip(a_mean - z*a_se, 0, 1).ravel()
+        d_columns[f"{name}_high"]  = np.minimum(a_mean + z*a_se, 1).ravel()
+
+    df = pd.DataFrame({
+        "entity": np.repeat([f"warehouse {i_wh+1}" for i_wh in range(n_warehouses)], len(k.l_groups)),
+        "group":  np.tile(k.l_groups, n_warehouses),
+        **d_columns
+        })
+    df["ess"] = ess
+
+    return df
+
+def run_parallel(
+         mfgqty_mu            :float,
+         mfgqty_sigma        :float,
+         mfg_normal          :bool, # if false, then log normal
+         l_mfggroups         :list,
+         l_mfgshares         :list,
+         lifetime            :int,
+         dmndqty_mu          :float,
+         dmndqty_sigma       :float,
+         dmnd_normal         :bool, # if false, then log normal
+         l_dmndprefs         :list,
+         l_dmndprefprobs     :list,
+         n_warehouses        :int,
+         supplierqty_mu      :float,
+         supplierqty_sigma   :float,
+         supplier_normal     :bool, # if false, then log normal
+         l_supplyprodgroups  :list,
+         l_supplyprodshares  :list,
+         l_deliveryleadtimes :list,
+         simlength           :int,
+         n_workers           :int = 1,
+         seed                :int = None,
+         inventorybackend    :str = "cohorts"
+         ) -> pd.DataFrame:
+    """
+    
+    same model as run(batched= True, rationing= "random"), with the warehouses split across n_workers worker processes
+    that synchronize once a day at the manufacturers stock allocation;
+    for a given seed, results are identical to run(batched= True, rationing= "random", result_mode= "aggregated") 
+    with the same inventorybackend, for any n_workers
+
+    returns:
+    - pandas.DataFrame in the format of run(result_mode= "aggregated")
+
+    """
 
-    return pd.DataFrame(data, columns= ["entity", "time", "preference", "product", "fulfilled"])
\ No newline at end of file
+    return parallel.run(
+                    mfgqty_mu= mfgqty_mu,
+                    mfgqty_sigma= mfgqty_sigma,
+                    mfg_normal= mfg_normal,
+                    l_mfggroups= l_mfggroups,
+                    l_mfgshares= l_mfgshares,
+                    lifetime= lifetime,
+                    dmndqty_mu= dmndqty_mu,
+                    dmndqty_sigma= dmndqty_sigma,
+                    dmnd_normal= dmnd_normal,
+                    l_dmndprefs= l_dmndprefs,
+                    l_dmndprefprobs= l_dmndprefprobs,
+                    n_warehouses= n_warehouses,
+                    supplierqty_mu= supplierqty_mu,
+                    supplierqty_sigma= supplierqty_sigma,
+                    supplier_normal= supplier_normal,
+                    l_supplyprodgroups= l_supplyprodgroups,
+                    l_supplyprodshares= l_supplyprodshares,
+                    l_deliveryleadtimes= l_deliveryleadtimes,
+                    simlength= simlength,
+                    n_workers= n_workers,
+                    seed= seed,
+                    inventorybackend= inventorybackend
+                    )
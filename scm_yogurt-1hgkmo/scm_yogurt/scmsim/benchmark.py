@@ -0,0 +1,365 @@
+import argparse
+import gc
+import json
+import math
+import multiprocessing
+import multiprocessing.connection
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import simpy
+
+import scmsim.api                      as api
+import scmsim.config                   as config
+
+try:
+
+    import resource
+
+except ImportError: # not available on windows, peak RSS is then not recorded
+
+    resource = None
+
+class CountingEnvironment(simpy.Environment):
+
+    """
+
+    simpy.Environment counting the events it processes
+
+    """
+
+    n_events :int
+
+    def __init__(self, *args, **kwargs):
+
+        super().__init__(*args, **kwargs)
+        self.n_events = 0
+
+    def step(self) -> None:
+
+        self.n_events += 1
+        super().step()
+
+# model of scmsim.config; the manufacturer volume is scaled with the number of warehouses,
+# so every case keeps the supply/demand balance of the base model
+d_base = dict(
+    simlength= config.simlength,
+    n_warehouses= config.warehouses,
+    volume= 1.0, # factor on daily quantities of manufacturer, warehouse purchases and demand
+    lifetime= config.lifetime
+)
+
+# one factor at a time around d_base
+d_sweeps = {
+    "simlength":    [300, 1000, 3650],
+    "n_warehouses": [3, 30, 200],
+    "volume":       [0.1, 1.0, 3.0],
+    "lifetime":     [7, 42, 90]
+}
+
+# compared metrics, relative increase over the baseline that counts as a regression
+d_tolerances = {
+    "wall_s":        0.10,
+    "events":        0.0,
+    "peak_rss_mb":   0.10,
+    "gc_gen0":       0.10,
+    "alloc_peak_mb": 0.10
+}
+
+def get_cases(d_sweeps :dict = d_sweeps,
+              d_base   :dict = d_base
+              ) -> list:
+    """
+
+    returns the list of case parameter dicts, without duplicates of d_base
+
+    """
+
+    l_cases = []
+
+    for param, l_values in d_sweeps.items():
+
+        for value in l_values:
+
+            d_case = dict(d_base, **{param: value})
+
+            if d_case not in l_cases: l_cases.append(d_case)
+
+    return l_cases
+
+def get_casename(d_case :dict) -> str:
+
+    return ",".join(f"{param}={value}" for param, value in d_case.items())
+
+def get_runargs(d_case :dict) -> dict:
+    """
+
+    maps a case to api.run arguments; volume scales the quantity distributions means,
+    which for log normal quantities means shifting mu by log(volume)
+
+    """
+
+    def scale(mu :float, normal :bool, factor :float) -> float:
+
+        return mu*factor if normal else mu + math.log(factor)
+
+    n_warehouses = d_case["n_warehouses"]
+
+    return dict(
+        mfgqty_mu= scale(config.mfgqty_mu, config.mfg_normal, d_case["volume"]*n_warehouses/config.warehouses),
+        mfgqty_sigma= config.mfgqty_sigma,
+        mfg_normal= config.mfg_normal,
+        l_mfggroups= config.mfg_groups,
+        l_mfgshares= config.mfg_shares,
+        lifetime= d_case["lifetime"],
+        dmndqty_mu= scale(config.dmndqty_mu, config.dmnd_normal, d_case["volume"]),
+        dmndqty_sigma= config.dmndqty_sigma,
+        dmnd_normal= config.dmnd_normal,
+        l_dmndprefs= config.dmnd_prefs,
+        l_dmndprefprobs= config.dmnd_probs,
+        n_warehouses= n_warehouses,
+        supplierqty_mu= scale(config.supqty_mu, config.sup_normal, d_case["volume"]),
+        supplierqty_sigma= config.supqty_sigma,
+        supplier_normal= config.sup_normal,
+        l_supplyprodgroups= config.sup_groups,
+        l_supplyprodshares= config.sup_shares,
+        l_deliveryleadtimes= [config.leadtimes[i % len(config.leadtimes)] for i in range(n_warehouses)],
+        simlength= d_case["simlength"]
+    )
+
+def measure_case(conn      :multiprocessing.connection.Connection,
+                 d_case    :dict,
+                 d_options :dict, # further api.run arguments, e.g. inventorybackend, batched, result_mode
+                 trace     :bool
+                 ) -> None:
+    """
+
+    worker process: runs one case and sends its measurements;
+    a fresh process per run keeps peak RSS and allocation counts free of earlier cases
+
+    """
+
+    env = CountingEnvironment()
+
+    if trace: tracemalloc.start()
+
+    gen0   = gc.get_stats()[0]["collections"]
+    blocks = sys.getallocatedblocks()
+    t0     = time.perf_counter()
+
+    api.run(**get_runargs(d_case), **d_options, env= env)
+
+    d_result = dict(
+        wall_s= time.perf_counter() - t0,
+        events= env.n_events,
+        gc_gen0= gc.get_stats()[0]["collections"] - gen0, # young generation collections, one per ~700 container allocations
+        blocks_retained= sys.getallocatedblocks() - blocks,
+        peak_rss_mb= None,
+        alloc_peak_mb= None
+    )
+
+    if trace:
+
+        d_result["alloc_peak_mb"] = tracemalloc.get_traced_memory()[1]/2**20
+        tracemalloc.stop()
+
+    if resource is not None:
+
+        # ru_maxrss is in kilobytes on linux, in bytes on macos
+        d_result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/(2**20 if sys.platform == "darwin" else 2**10), 1)
+
+    conn.send(d_result)
+    conn.close()
+
+def run_case(d_case    :dict,
+             d_options :dict = {},
+             repeat    :int = 3,
+             trace     :bool = False
+             ) -> dict:
+    """
+
+    runs a case repeat times in fresh processes;
+    reports the minimum wall time and the maximum of the other metrics
+
+    """
+
+    context   = multiprocessing.get_context("spawn")
+    l_results = []
+
+    for _ in range(repeat):
+
+        conn, conn_worker = context.Pipe()
+        process = context.Process(target= measure_case, args= (conn_worker, d_case, d_options, trace))
+        process.start()
+        l_results.append(conn.recv())
+        process.join()
+
+    def combine(metric :str, func) -> float:
+
+        l_values = [d[metric] for d in l_results if d[metric] is not None]
+
+        return func(l_values) if l_values else None
+
+    return dict(
+        name= get_casename(d_case),
+        case= d_case,
+        wall_s= combine("wall_s", min),
+        events= combine("events", max),
+        gc_gen0= combine("gc_gen0", max),
+        blocks_retained= combine("blocks_retained", max),
+        peak_rss_mb= combine("peak_rss_mb", max),
+        alloc_peak_mb= combine("alloc_peak_mb", max)
+    )
+
+def run(path      :str,
+        l_cases   :list = None,
+        d_options :dict = {},
+        repeat    :int = 3,
+        trace     :bool = False,
+        seed      :int = 1
+        ) -> dict:
+    """
+
+    runs all cases (get_cases() by default) and writes the results as json to path;
+    tracing allocations with tracemalloc slows runs down, so with trace the wall times are not comparable to untraced ones
+
+    returns:
+    - dict with the run settings (meta) and one result dict per case (cases)
+
+    """
+
+    l_cases   = l_cases if l_cases is not None else get_cases()
+    d_options = dict(d_options, seed= seed)
+
+    d_report = dict(
+        meta= dict(
+            date= time.strftime("%Y-%m-%dT%H:%M:%S"),
+            python= platform.python_version(),
+            platform= platform.platform(),
+            simpy= simpy.__version__,
+            numpy= np.__version__,
+            pandas= pd.__version__,
+            options= d_options,
+            repeat= repeat,
+            trace= trace
+        ),
+        cases= []
+    )
+
+    for d_case in l_cases:
+
+        d_result = run_case(d_case= d_case, d_options= d_options, repeat= repeat, trace= trace)
+        d_report["cases"].append(d_result)
+
+        print(f"{d_result['name']}: {d_result['wall_s']:.2f} s, {d_result['events']} events, peak RSS {d_result['peak_rss_mb']} MB")
+
+        # written after every case, so an aborted sweep keeps its results
+        with open(path, "w") as f:
+
+            json.dump(d_report, f, indent= 2)
+
+    return d_report
+
+def compare(d_report     :dict,
+            d_baseline   :dict,
+            d_tolerances :dict = d_tolerances
+            ) -> pd.DataFrame:
+    """
+
+    compares the metrics of every case found in both reports
+
+    returns:
+    - pandas.DataFrame with one row per case and metric, the relative change and whether it exceeds the tolerance
+
+    """
+
+    d_basecases = {d["name"]: d for d in d_baseline["cases"]}
+    data        = []
+
+    for d_result in d_report["cases"]:
+
+        d_base = d_basecases.get(d_result["name"])
+
+        if d_base is None: continue
+
+        for metric, tolerance in d_tolerances.items():
+
+            value, basevalue = d_result.get(metric), d_base.get(metric)
+
+            if value is None or basevalue is None: continue
+
+            change = (value - basevalue)/basevalue if basevalue else (0.0 if value == basevalue else math.inf)
+
+            data.append([d_result["name"], metric, basevalue, value, change, change > tolerance])
+
+    return pd.DataFrame(data, columns= ["case", "metric", "baseline", "value", "change", "regression"])
+
+def main(l_args :list = None) -> int:
+
+    parser = argparse.ArgumentParser(prog= "python -m scmsim.benchmark", description= "scaling benchmark of scmsim.api.run")
+    subparsers = parser.add_subparsers(dest= "command", required= True)
+
+    parser_run = subparsers.add_parser("run", help= "run the sweep and write results as json")
+    parser_run.add_argument("path")
+    parser_run.add_argument("--repeat", type= int, default= 3)
+    parser_run.add_argument("--trace", action= "store_true", help= "record peak allocated memory with tracemalloc")
+    parser_run.add_argument("--quick", action= "store_true", help= "only the smallest value of every sweep")
+    parser_run.add_argument("--inventorybackend", default= "units")
+    parser_run.add_argument("--batched", action= "store_true")
+    parser_run.add_argument("--result_mode", default= "units")
+    parser_run.add_argument("--baseline", help= "json of an earlier run to compare against")
+
+    parser_compare = subparsers.add_parser("compare", help= "compare two result files")
+    parser_compare.add_argument("path")
+    parser_compare.add_argument("baseline")
+
+    args = parser.parse_args(l_args)
+
+    if args.command == "run":
+
+        l_cases = get_cases({param: l_values[:1] for param, l_values in d_sweeps.items()}) if args.quick else get_cases()
+        d_report = run(
+                    path= args.path,
+                    l_cases= l_cases,
+                    d_options= dict(inventorybackend= args.inventorybackend, batched= args.batched, result_mode= args.result_mode),
+                    repeat= args.repeat,
+                    trace= args.trace
+                    )
+
+        if args.baseline is None: return 0
+
+        path_baseline = args.baseline
+
+    else:
+
+        with open(args.path) as f: d_report = json.load(f)
+
+        path_baseline = args.baseline
+
+    with open(path_baseline) as f: d_baseline = json.load(f)
+
+    if d_report["meta"]["options"] != d_baseline["meta"]["options"] or d_report["meta"]["trace"] != d_baseline["meta"]["trace"]:
+
+        print("warning: reports were run with different options, metrics may not be comparable")
+
+    df = compare(d_report, d_baseline)
+
+    with pd.option_context("display.width", 200, "display.max_rows", None):
+
+        print(df.to_string(index= False))
+
+    df_regressions = df.loc[df["regression"]]
+
+    if len(df_regressions):
+
+        print(f"{len(df_regressions)} regression(s) beyond tolerance")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+
+    sys.exit(main())
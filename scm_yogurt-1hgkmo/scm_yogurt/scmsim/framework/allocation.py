@@ -0,0 +1,291 @@
+import numpy as np
+
+class SubstitutionAllocator:
+
+    """
+
+    allocates a days demand, given as unit counts per preference tuple, to stock counts per group in one call;
+    the compatibility matrix and the sequence of (preference, group) passes are precomputed,
+    and every pass is one array operation over any leading axes (e.g. warehouses, replications)
+
+    rules:
+    - "preference": preference tuples in order, each served from its groups in preference order;
+      same result as serving unit by unit with Inventory.retrieve
+    - "minimize_reserved": first every tuple from its first choice, then substitutes other than reservedgroup
+      rank by rank, and reservedgroup (e.g. the universal donor ONeg) only as a last resort
+
+    with fluidgroups, only preference tuples of fluid groups alone (as demand.DemandPattern rounds them) are allocated 
+    fractional quantities; all other tuples take whole units, also from fractional fluid stock, so fractions never 
+    reach discrete groups or discrete demand
+
+    """
+
+    l_groups      :list       # groupstrs, index = group axis
+    l_preferences :list       # preference tuples, index = preference axis
+    rule          :str
+    reservedgroup :str
+    a_rank        :np.ndarray # (preference, group), rank of group in preference tuple, -1 if incompatible
+    a_whole       :np.ndarray # bool, (preference, ), true where the tuple is allocated whole units only
+    l_ranked      :list       # per preference tuple, group indices in preference order
+    l_passes      :list       # list of (preference index, group index), in allocation order
+
+    def __init__(self,
+                 l_preferences :list, # list of tuples
+                 l_groups      :list = None, # list of str, by default all groups found in l_preferences
+                 rule          :str = "preference",
+                 reservedgroup :str = "ONeg",
+                 fluidgroups   :list = () # groups tracked as continuous flows
+                 ):
+
+        if rule not in ("preference", "minimize_reserved"):
+
+            raise ValueError(f"unknown allocation rule: {rule}, choose from ['preference', 'minimize_reserved']")
+
+        self.l_preferences = list(l_preferences)
+        self.l_groups      = list(l_groups) if l_groups is not None else list(dict.fromkeys(g for t_pref in self.l_preferences for g in t_pref))
+        self.rule          = rule
+        self.reservedgroup = reservedgroup
+
+        self.a_rank = np.full((len(self.l_preferences), len(self.l_groups)), -1, dtype= int)
+
+        for i_pref, t_pref in enumerate(self.l_preferences):
+
+            for rank, groupstr in enumerate(dict.fromkeys(t_pref)):
+
+                if groupstr in self.l_groups: self.a_rank[i_pref, self.l_groups.index(groupstr)] = rank
+
+        self.a_whole  = np.array([not all(g in fluidgroups for g in t_pref) for t_pref in self.l_preferences], dtype= bool)
+        self.l_ranked = [sorted(np.nonzero(a_ranks >= 0)[0].tolist(), key= lambda i_group: a_ranks[i_group]) for a_ranks in self.a_rank]
+        self.l_passes = self.get_passes()
+
+    def get_passes(self) -> list:
+
+        l_ranked = self.l_ranked
+
+        if self.rule == "preference":
+
+            return [(i_pref, i_group) for i_pref, l_idx in enumerate(l_ranked) for i_group in l_idx]
+
+        i_reserved = self.l_groups.index(self.reservedgroup) if self.reservedgroup in self.l_groups else -1
+        n_ranks    = max((len(l_idx) for l_idx in l_ranked), default= 0)
+
+        l_passes = [(i_pref, l_idx[0]) for i_pref, l_idx in enumerate(l_ranked) if l_idx]
+
+        for rank in range(1, n_ranks):
+
+            l_passes.extend((i_pref, l_idx[rank]) for i_pref, l_idx in enumerate(l_ranked) if len(l_idx) > rank and l_idx[rank] != i_reserved)
+
+        for rank in range(1, n_ranks):
+
+            l_passes.extend((i_pref, l_idx[rank]) for i_pref, l_idx in enumerate(l_ranked) if len(l_idx) > rank and l_idx[rank] == i_reserved)
+
+        return l_passes
+
+    def allocate(self,
+                 a_demand :np.ndarray, # (..., preference), units demanded
+                 a_stock  :np.ndarray  # (..., group), units on stock
+                 ) -> np.ndarray:
+        """
+
+        returns units allocated per preference tuple and group, shape (..., preference, group);
+        unallocated demand is a_demand - a_alloc.sum(axis= -1); fractional if either input is (fluid groups),
+        but whole for tuples with a discrete group (a_whole)
+
+        """
+
+        dtype   = np.result_type(np.asarray(a_demand), np.asarray(a_stock), np.int64)
+        a_open  = np.array(a_demand, dtype= dtype)
+        a_left  = np.array(a_stock, dtype= dtype)
+        a_alloc = np.zeros(a_open.shape + (len(self.l_groups), ), dtype= dtype)
+        fluid   = dtype.kind == "f"
+
+        for i_pref, i_group in self.l_passes:
+
+            a_take = np.minimum(a_open[..., i_pref], a_left[..., i_group])
+
+            if fluid and self.a_whole[i_pref]: a_take = np.floor(a_take)
+
+            a_alloc[..., i_pref, i_group] = a_take
+            a_open[..., i_pref]  -= a_take
+            a_left[..., i_group] -= a_take
+
+        return a_alloc
+
+def fill_in_order(a_requests :np.ndarray, # (requester, group)
+                  a_stock    :np.ndarray, # (group, )
+                  a_order    :np.ndarray  # requester indices, first served first
+                  ) -> np.ndarray:
+    """
+
+    serves requesters one after another in a_order, each as far as stock lasts; returns (requester, group)
+
+    """
+
+    a_sorted = a_requests[a_order]
+    a_before = np.cumsum(a_sorted, axis= 0) - a_sorted
+
+    a_alloc = np.zeros_like(a_requests)
+    a_alloc[a_order] = np.clip(a_stock - a_before, 0, a_sorted)
+
+    return a_alloc
+
+class RandomOrderRationing:
+
+    """
+
+    serves requesters in an order drawn from rng per day, each as far as stock lasts;
+    the explicit form of warehouses reaching the manufacturer in random order
+
+    """
+
+    rng :np.random.Generator
+
+    def __init__(self,
+                 rng :np.random.Generator = None
+                 ):
+
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+    def ration(self,
+               a_requests :np.ndarray, # (requester, group), units requested
+               a_stock    :np.ndarray  # (group, ), units on stock
+               ) -> tuple:
+        """
+
+        returns (units allocated per requester and group, requester indices in order of issue)
+
+        """
+
+        a_order = self.rng.permutation(len(a_requests))
+
+        return fill_in_order(a_requests, a_stock, a_order), a_order
+
+class PriorityRationing:
+
+    """
+
+    serves requesters by ascending priority, ties in requester order
+
+    """
+
+    a_priorities :np.ndarray # per requester
+
+    def __init__(self,
+                 l_priorities :list # per requester, lower is served first
+                 ):
+
+        self.a_priorities = np.asarray(l_priorities)
+
+    def ration(self,
+               a_requests :np.ndarray,
+               a_stock    :np.ndarray
+               ) -> tuple:
+
+        a_order = np.argsort(self.a_priorities, kind= "stable")
+
+        return fill_in_order(a_requests, a_stock, a_order), a_order
+
+class ProportionalRationing:
+
+    """
+
+    shares short stock of a group in proportion to the requested units;
+    units left over by rounding down go to the largest remainders, ties in requester order;
+    groups with fractional requests or stock (fluid groups) are shared exactly, all others in whole units
+
+    """
+
+    def ration(self,
+               a_requests :np.ndarray,
+               a_stock    :np.ndarray
+               ) -> tuple:
+
+        a_stock    = np.asarray(a_stock)
+        fluid      = np.result_type(np.asarray(a_requests), a_stock).kind == "f"
+        a_requests = np.asarray(a_requests, dtype= float if fluid else np.int64)
+        a_alloc    = a_requests.copy()
+        a_total    = a_requests.sum(axis= 0)
+
+        for i_group in np.nonzero(a_total > a_stock)[0]:
+
+            a_exact = a_requests[:, i_group]*(a_stock[i_group]/a_total[i_group])
+
+            if fluid and ((a_requests[:, i_group] % 1).any() or a_stock[i_group] % 1):
+
+                a_alloc[:, i_group] = a_exact
+                continue
+
+            a_alloc[:, i_group] = np.floor(a_exact)
+
+            n_left = int(a_stock[i_group] - a_alloc[:, i_group].sum())
+            a_alloc[np.argsort(-(a_exact - a_alloc[:, i_group]), kind= "stable")[:n_left], i_group] += 1
+
+        return a_alloc, np.arange(len(a_requests))
+
+def get_rationing(rule         :str,
+                  rng          :np.random.Generator = None, # for "random"
+                  l_priorities :list = None                 # for "priority"
+                  ): # -> RandomOrderRationing, PriorityRationing or ProportionalRationing
+
+    if rule == "random": return RandomOrderRationing(rng= rng)
+
+    if rule == "priority":
+
+        if l_priorities is None: raise ValueError("rationing rule priority requires l_priorities")
+
+        return PriorityRationing(l_priorities= l_priorities)
+
+    if rule == "proportional": return ProportionalRationing()
+
+    raise ValueError(f"unknown rationing rule: {rule}, choose from ['random', 'proportional', 'priority']")
+
+class AllocationPhase:
+
+    """
+
+    one simpy process driving a whole day in fixed phases: production, collection of all warehouses purchase requests,
+    one rationed allocation of the manufacturers stock, then receipts and demand at every warehouse;
+    replaces the production and warehousing processes, and their jitter, by one event per day
+
+    """
+
+    env       :object # simpy.Environment or utils.Clock
+    supplier  :object # manufacturing.Manufacturer
+    whs       :list   # batched warehousing.Warehouse instances
+    rationing :object # e.g. RandomOrderRationing
+
+    def __init__(self,
+                 env       :object,
+                 supplier  :object,
+                 whs       :list,
+                 rationing :object
+                 ):
+
+        self.env       = env
+        self.supplier  = supplier
+        self.whs       = whs
+        self.rationing = rationing
+
+    def run_day(self) -> None:
+
+        self.supplier.produce()
+
+        l_groups   = self.whs[0].supplymodel.l_groups
+        l_requests = [wh.supplymodel.get_purchaseqtys() for wh in self.whs]
+        a_requests = np.array(l_requests, dtype= np.result_type(np.int64, *l_requests)).reshape(len(self.whs), len(l_groups))
+
+        for wh, l_slices in zip(self.whs, self.supplier.distribution_rationed(l_groups= l_groups, a_requests= a_requests, rationing= self.rationing)):
+
+            wh.accept_purchase(l_slices)
+
+        for wh in self.whs:
+
+            wh.operate()
+
+    def process(self):
+
+        while True:
+
+            self.run_day()
+
+            yield self.env.timeout(1)
@@ -1,5 +1,4 @@
 import simpy
-import random
 import numpy as np
 
 import scmsim.framework.inventory as inventory
@@ -10,27 +9,37 @@ class DemandPattern:
     qty_mu        :float #underlying normal distribution
     qty_sigma     :float #underlying normal distribution
     gaussian      :bool
+    l_preferences :list  # preference tuples, in order of d_productprogram
+    a_probs       :np.ndarray # probabilities, aligned with l_preferences
+    rng           :np.random.Generator # stream for all quantity draws
+    a_fluid       :np.ndarray # bool, aligned with l_preferences; true if all groups of the tuple are fluid, whose quantities are not rounded
 
     def __init__(self,
                  qty_mu :float,
                  qty_sigma :float,
                  gaussian :bool,
                  l_preferences :list, # list of tuples
-                 l_probs :list  
+                 l_probs :list,
+                 rng :np.random.Generator = None,
+                 fluidgroups :list = () # groups tracked as continuous flows, batched only
                  ):
 
         self.qty_sigma = qty_sigma 
         self.qty_mu = qty_mu
         self.gaussian= gaussian
         self.d_productprogram = {l_preferences[i]: l_probs[i] for i in range(len(l_preferences))}
+        self.l_preferences = list(self.d_productprogram.keys())
+        self.a_probs = np.array(list(self.d_productprogram.values()), dtype= float)
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.a_fluid = np.array([all(g in fluidgroups for g in t_pref) for t_pref in self.l_preferences], dtype= bool)
     
     def get_salesorders(self) -> list: # list of tuples
 
         qty_total= 0 
         if self.gaussian:
-            qty_total = random.gauss(mu= self.qty_mu, sigma= self.qty_sigma)
+            qty_total = self.rng.normal(self.qty_mu, self.qty_sigma)
         else:
-            qty_total = np.random.lognormal(self.qty_mu, self.qty_sigma, 1)[0]
+            qty_total = self.rng.lognormal(self.qty_mu, self.qty_sigma)
 
         l_return = []
 
@@ -44,22 +53,45 @@ class DemandPattern:
         
         return l_return
 
+    def get_salesqtys(self) -> np.ndarray:
+
+        """
+        
+        batched alternative to get_salesorders: returns the days demand as quantities per preference tuple,
+        aligned with l_preferences, drawn from rng
+
+        """
+
+        if self.gaussian:
+            qty_total = self.rng.normal(self.qty_mu, self.qty_sigma)
+        else:
+            qty_total = self.rng.lognormal(self.qty_mu, self.qty_sigma)
+
+        a_qtys = qty_total*self.a_probs
+
+        if self.a_fluid.any(): return np.maximum(np.where(self.a_fluid, a_qtys, np.round(a_qtys)), 0)
+
+        return np.maximum(np.round(a_qtys), 0).astype(int)
+
 class SalesOrder:
 
     t_pref         :tuple # tuple of str
     date           :int   # iteration of purchase
     product        :inventory.Product 
     fulfilled      :bool
+    qty            :int   # units covered by this order (batched mode), 1 otherwise; fractional for fluid groups
 
     def __init__(self,
                 t_pref  :tuple,  # tuple of strs,
                 date    :int = None,
-                product :inventory.Product = None
+                product :inventory.Product = None,
+                qty     :int = 1
                 ):
         
         self.t_pref      = t_pref
         self.date        = date
         self.product     = product
+        self.qty         = qty
         
         if self.product:
             
@@ -1,6 +1,11 @@
 import simpy
+import heapq
+import numpy as np
 from collections import deque
 
+# quantities below are treated as zero; only fluid groups hold fractional units
+EPSILON = 1e-9
+
 class Product:
 
     groupstr :str
@@ -53,11 +58,15 @@ class InventoryGroup:
         self.qty     = 0
     
     def putaway(self,
-                product :Product
+                product :Product,
+                qty     :int = 1
                 ) -> None:
         
-        self.l_stock.append(product)
-        self.qty += 1
+        for _ in range(qty):
+
+            self.l_stock.append(product)
+        
+        self.qty += qty
     
     def retrieve(self) -> Product:
         
@@ -68,6 +77,34 @@ class InventoryGroup:
         
         return None
 
+    def retrieve_qty(self,
+                     qty :int
+                     ) -> list:
+        """
+        
+        retrieves up to qty units (FIFO); returns list of [Product, qty]
+
+        """
+
+        l_return = []
+        qty = int(min(qty, self.qty)) # integral, but may come as float next to fluid groups
+
+        for _ in range(qty):
+
+            p = self.l_stock.popleft()
+
+            if l_return and l_return[-1][0] is p:
+
+                l_return[-1][1] += 1
+            
+            else:
+
+                l_return.append([p, 1])
+        
+        self.qty -= qty
+
+        return l_return
+
     def checkvalidity(self) -> int:
 
         diff = 0
@@ -87,6 +124,8 @@ class Inventory:
     env           :simpy.Environment
     d_invgroups   :dict  # key groupstr, value InventoryGroup instance
     qty           :int
+    qty_outdated  :int   # units removed by checkvalidity since creation
+    d_outdated    :dict  # key groupstr, value units removed by checkvalidity since creation
     
     def __init__(self, 
                  env: simpy.Environment
@@ -95,19 +134,28 @@ class Inventory:
         self.env = env
         self.d_invgroups = {} # key: groupstr, val: InventoryGroup
         self.qty = 0
+        self.qty_outdated = 0
+        self.d_outdated = {}
     
     def putaway(self, 
-                p: Product
+                p: Product,
+                qty :int = 1
                 ) -> None:
 
         if p.groupstr not in self.d_invgroups.keys():
 
-            self.d_invgroups[p.groupstr] = InventoryGroup(env= self.env, groupstr= p.groupstr)
+            self.d_invgroups[p.groupstr] = self.new_invgroup(groupstr= p.groupstr)
         
-        self.d_invgroups[p.groupstr].putaway(product= p)
+        self.d_invgroups[p.groupstr].putaway(product= p, qty= qty)
         
-        self.qty += 1
+        self.qty += qty
     
+    def new_invgroup(self,
+                     groupstr :str
+                     ): # -> InventoryGroup or a backends group type
+
+        return InventoryGroup(env= self.env, groupstr= groupstr)
+
     def retrieve(self, 
                  t_pref   :tuple
                 )        -> Product:
@@ -123,8 +171,503 @@ class Inventory:
         
         return None
 
+    def retrieve_batch(self, 
+                       t_pref   :tuple,
+                       qty      :int
+                       )        -> list:
+        """
+        
+        retrieves qty units for one preference tuple, walking the groups in preference order;
+        returns list of [Product, qty], which may cover less than qty if stock is short
+
+        """
+
+        l_return = []
+
+        for groupstr in t_pref:
+
+            if qty <= 0: break
+
+            if groupstr in self.d_invgroups.keys():
+
+                l_slices = self.d_invgroups[groupstr].retrieve_qty(qty= qty)
+
+                for _, n in l_slices:
+
+                    qty      -= n
+                    self.qty -= n
+
+                l_return.extend(l_slices)
+        
+        return l_return
+
+    def get_groupqtys(self,
+                      l_groups :list # list of str
+                      ) -> np.ndarray:
+
+        return np.array([self.d_invgroups[g].qty if g in self.d_invgroups else 0 for g in l_groups], dtype= np.int64)
+
     def checkvalidity(self) -> None:
 
-        for invgroup in self.d_invgroups.values():
+        for groupstr, invgroup in self.d_invgroups.items():
+
+            diff = invgroup.checkvalidity()
+
+            if diff == 0: continue
+
+            self.qty -= diff
+            self.qty_outdated += diff
+            self.d_outdated[groupstr] = self.d_outdated.get(groupstr, 0) + diff
+
+class CohortInventoryGroup:
+
+    """
+    
+    stores one group as counts per cohort (units sharing manufacturing and expiry date) instead of one 
+    Product per unit; cohorts are kept in arrival order, so FIFO retrieval takes from the leftmost cohort;
+    all units of a cohort are represented by one shared Product instance
+
+    """
+
+    env        :simpy.Environment
+    groupstr   :str
+    l_cohorts  :deque # list of [Product, qty], in arrival order
+    qty        :int
+
+    def __init__(self,
+                 env :simpy.Environment,
+                 groupstr :str
+                 ) -> None:
+        
+        self.env = env
+        self.groupstr = groupstr
+        self.l_cohorts = deque([])
+        self.qty       = 0
+    
+    def putaway(self,
+                product :Product,
+                qty     :int = 1
+                ) -> None:
+        
+        # units arriving with the same dates as the latest cohort are merged into it
+        if self.l_cohorts:
+            
+            cohort = self.l_cohorts[-1]
+
+            if cohort[0].date_val == product.date_val and cohort[0].date_mfg == product.date_mfg:
+
+                cohort[1] += qty
+                self.qty  += qty
+                return
+        
+        self.l_cohorts.append([product, qty])
+        self.qty += qty
+    
+    def retrieve(self) -> Product:
+        
+        if self.qty > 0:
+
+            cohort = self.l_cohorts[0]
+            cohort[1] -= 1
+            self.qty  -= 1
+
+            if cohort[1] == 0: 
+                
+                self.l_cohorts.popleft()
+            
+            return cohort[0]
+        
+        return None
+
+    def retrieve_qty(self,
+                     qty :int
+                     ) -> list:
+        """
+        
+        retrieves up to qty units (FIFO) cohort by cohort; returns list of [Product, qty]
+
+        """
+
+        l_return = []
+
+        while qty > 0 and self.qty > 0:
+
+            cohort = self.l_cohorts[0]
+            n = min(qty, cohort[1])
+            
+            cohort[1] -= n
+            self.qty  -= n
+            qty       -= n
+
+            if cohort[1] == 0:
+
+                self.l_cohorts.popleft()
+            
+            l_return.append([cohort[0], n])
+
+        return l_return
+
+    def checkvalidity(self) -> int:
+
+        diff = 0
+        l_valid = deque([])
+
+        for cohort in self.l_cohorts:
+
+            if self.env.now > cohort[0].date_val:
+
+                diff += cohort[1]
+            
+            else:
+
+                l_valid.append(cohort)
+        
+        self.l_cohorts = l_valid
+        self.qty -= diff
+        
+        return diff
+
+class CohortInventory(Inventory):
+
+    """
+    
+    inventory backend storing counts per (group, expiry) cohort; 
+    same interface as Inventory, so it can be handed to Manufacturer and Warehouse as inventorymodel
+
+    """
+
+    def new_invgroup(self,
+                     groupstr :str
+                     ) -> CohortInventoryGroup:
+
+        return CohortInventoryGroup(env= self.env, groupstr= groupstr)
+
+class SortedCohortInventoryGroup:
+
+    """
+    
+    stores one group as cohorts in a heap ordered by the issuing policy, so retrieval takes the next cohort 
+    in O(log n) regardless of arrival order:
+    - "fefo": first expiry first out, ties by manufacturing date
+    - "lifo": last arrived first out
+    - "youngest": latest manufacturing date first, ties by expiry
+
+    """
+
+    env       :simpy.Environment
+    groupstr  :str
+    policy    :str
+    l_heap    :list # heap of cohort keys
+    d_cohorts :dict # key: cohort key, value: [Product, qty]
+    n_arrived :int  # cohorts put away so far, orders lifo
+    qty       :int
+
+    def __init__(self,
+                 env      :simpy.Environment,
+                 groupstr :str,
+                 policy   :str
+                 ) -> None:
+
+        self.env       = env
+        self.groupstr  = groupstr
+        self.policy    = policy
+        self.l_heap    = []
+        self.d_cohorts = {}
+        self.n_arrived = 0
+        self.qty       = 0
+
+    def get_key(self,
+                product :Product
+                ) -> tuple:
+
+        if self.policy == "fefo": return (product.date_val, product.date_mfg)
+
+        if self.policy == "youngest": return (-product.date_mfg, product.date_val)
+
+        # lifo: units arriving with the same dates as the latest cohort are merged into it
+        if self.n_arrived:
+
+            key = (-(self.n_arrived - 1), )
+            cohort = self.d_cohorts.get(key)
+
+            if cohort and cohort[0].date_val == product.date_val and cohort[0].date_mfg == product.date_mfg: return key
+
+        self.n_arrived += 1
+
+        return (-(self.n_arrived - 1), )
+
+    def putaway(self,
+                product :Product,
+                qty     :int = 1
+                ) -> None:
+
+        key = self.get_key(product)
+
+        if key in self.d_cohorts:
+
+            self.d_cohorts[key][1] += qty
+
+        else:
+
+            self.d_cohorts[key] = [product, qty]
+            heapq.heappush(self.l_heap, key)
+
+        self.qty += qty
+
+    def retrieve(self) -> Product:
+
+        l_slices = self.retrieve_qty(qty= 1)
+
+        return l_slices[0][0] if l_slices else None
+
+    def retrieve_qty(self,
+                     qty :int
+                     ) -> list:
+        """
+        
+        retrieves up to qty units cohort by cohort in policy order; returns list of [Product, qty]
+
+        """
+
+        l_return = []
+
+        while qty > 0 and self.qty > 0:
+
+            cohort = self.d_cohorts[self.l_heap[0]]
+            n = min(qty, cohort[1])
+
+            cohort[1] -= n
+            self.qty  -= n
+            qty       -= n
+
+            if cohort[1] == 0:
+
+                del self.d_cohorts[heapq.heappop(self.l_heap)]
+
+            l_return.append([cohort[0], n])
+
+        return l_return
+
+    def checkvalidity(self) -> int:
+
+        diff = 0
+
+        # expired cohorts sit on top of the heap under fefo, elsewhere they are found by a scan over cohorts
+        if self.policy == "fefo":
+
+            while self.l_heap and self.env.now > self.d_cohorts[self.l_heap[0]][0].date_val:
+
+                diff += self.d_cohorts.pop(heapq.heappop(self.l_heap))[1]
+
+        else:
+
+            l_expired = [key for key, cohort in self.d_cohorts.items() if self.env.now > cohort[0].date_val]
+
+            for key in l_expired:
+
+                diff += self.d_cohorts.pop(key)[1]
+
+            if l_expired:
+
+                self.l_heap = list(self.d_cohorts.keys())
+                heapq.heapify(self.l_heap)
+
+        self.qty -= diff
+
+        return diff
+
+class SortedCohortInventory(Inventory):
+
+    """
+    
+    inventory backend issuing by policy (see SortedCohortInventoryGroup); subclasses fix the policy,
+    so they can be handed to Manufacturer and Warehouse as inventorymodel
+
+    """
+
+    policy :str
+
+    def new_invgroup(self,
+                     groupstr :str
+                     ) -> SortedCohortInventoryGroup:
+
+        return SortedCohortInventoryGroup(env= self.env, groupstr= groupstr, policy= self.policy)
+
+class FluidInventoryGroup:
+
+    """
+    
+    stores one high-volume group as a continuous age distribution: fractional masses per cohort, in arrival order;
+    retrieval takes fractions of cohorts FIFO, so quantities flow through without rounding to units
+
+    """
+
+    env       :simpy.Environment
+    groupstr  :str
+    l_cohorts :deque # list of [Product, mass], in arrival order
+    qty       :float
+
+    def __init__(self,
+                 env      :simpy.Environment,
+                 groupstr :str
+                 ) -> None:
+
+        self.env       = env
+        self.groupstr  = groupstr
+        self.l_cohorts = deque([])
+        self.qty       = 0.0
+
+    def putaway(self,
+                product :Product,
+                qty     :float = 1
+                ) -> None:
+
+        if self.l_cohorts:
+
+            cohort = self.l_cohorts[-1]
+
+            if cohort[0].date_val == product.date_val and cohort[0].date_mfg == product.date_mfg:
+
+                cohort[1] += qty
+                self.qty  += qty
+                return
+
+        self.l_cohorts.append([product, qty])
+        self.qty += qty
+
+    def retrieve(self) -> Product:
+
+        l_slices = self.retrieve_qty(qty= 1)
+
+        return l_slices[0][0] if l_slices else None
+
+    def retrieve_qty(self,
+                     qty :float
+                     ) -> list:
+        """
+        
+        retrieves up to qty (FIFO) cohort by cohort; returns list of [Product, mass]
+
+        """
+
+        l_return = []
+
+        while qty > EPSILON and self.l_cohorts:
+
+            cohort = self.l_cohorts[0]
+            n = min(qty, cohort[1])
+
+            cohort[1] -= n
+            self.qty  -= n
+            qty       -= n
+
+            # drops rounding residue with the cohort
+            if cohort[1] <= EPSILON:
+
+                self.qty -= cohort[1]
+                self.l_cohorts.popleft()
+
+            l_return.append([cohort[0], n])
+
+        return l_return
+
+    def checkvalidity(self) -> float:
+
+        diff = sum(cohort[1] for cohort in self.l_cohorts if self.env.now > cohort[0].date_val)
+
+        if diff:
+
+            self.l_cohorts = deque(cohort for cohort in self.l_cohorts if not self.env.now > cohort[0].date_val)
+            self.qty -= diff
+
+        return diff
+
+class HybridInventory(Inventory):
+
+    """
+    
+    inventory backend keeping fluidgroups as FluidInventoryGroup and all other groups in the groups of a discrete backend;
+    build with functools.partial(HybridInventory, discretemodel= ..., fluidgroups= ...) to hand it over as inventorymodel
+
+    """
+
+    discrete    :Inventory # instance of the discrete backend, used to create its group type
+    fluidgroups :frozenset
+
+    def __init__(self,
+                 env           :simpy.Environment,
+                 discretemodel :type = Inventory,
+                 fluidgroups   :list = ()
+                 ):
+
+        super().__init__(env= env)
+
+        self.discrete    = discretemodel(env= env)
+        self.fluidgroups = frozenset(fluidgroups)
+
+    def new_invgroup(self,
+                     groupstr :str
+                     ): # -> FluidInventoryGroup or the discrete backends group type
+
+        if groupstr in self.fluidgroups: return FluidInventoryGroup(env= self.env, groupstr= groupstr)
+
+        return self.discrete.new_invgroup(groupstr= groupstr)
+
+    def get_wholeqty(self,
+                     l_groups :tuple, # groups the quantity is put into or taken from
+                     qty      :float
+                     ): # -> int, or qty unchanged if all groups are fluid
+        """
+        
+        discrete groups only take whole units; a fractional quantity there means fluid flow leaked into them
+
+        """
+
+        if all(g in self.fluidgroups for g in l_groups): return qty
+
+        if abs(qty - round(qty)) > EPSILON:
+
+            raise ValueError(f"fractional quantity {qty} for discrete groups {tuple(g for g in l_groups if g not in self.fluidgroups)}")
+
+        return int(round(qty))
+
+    def putaway(self,
+                p   :Product,
+                qty :float = 1
+                ) -> None:
+
+        super().putaway(p, qty= self.get_wholeqty((p.groupstr, ), qty))
+
+    def retrieve_batch(self,
+                       t_pref :tuple,
+                       qty    :float
+                       ) -> list:
+
+        return super().retrieve_batch(t_pref= t_pref, qty= self.get_wholeqty(t_pref, qty))
+
+    def get_groupqtys(self,
+                      l_groups :list # list of str
+                      ) -> np.ndarray:
+
+        return np.array([self.d_invgroups[g].qty if g in self.d_invgroups else 0 for g in l_groups], dtype= float)
+
+class FEFOInventory(SortedCohortInventory):
+
+    policy = "fefo"
+
+class LIFOInventory(SortedCohortInventory):
+
+    policy = "lifo"
+
+class YoungestFirstInventory(SortedCohortInventory):
+
+    policy = "youngest"
 
-            self.qty -= invgroup.checkvalidity()
\ No newline at end of file
+# inventory backends selectable by name, e.g. from api.run; units and cohorts issue fifo (in arrival order)
+d_backends = {
+    "units"    : Inventory,
+    "cohorts"  : CohortInventory,
+    "fefo"     : FEFOInventory,
+    "lifo"     : LIFOInventory,
+    "youngest" : YoungestFirstInventory
+}
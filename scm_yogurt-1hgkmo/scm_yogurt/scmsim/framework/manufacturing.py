@@ -1,5 +1,4 @@
 import simpy
-import random
 import numpy as np
 from collections import deque
 import scmsim.framework.inventory as inventory
@@ -21,7 +20,11 @@ class Manufacturer:
     d_productionprogram     :dict      # key: groupstr, value (probability)
     inventory               :inventory.Inventory
     shelflife               :inventory.ShelfLife
-    l_processedorders       :deque # list of demand.SalesOrder
+    l_processedorders       :deque # list of demand.SalesOrder, or a recording.RecorderChannel
+    rng                     :np.random.Generator
+    productionmodel         :object    # e.g. replay.TraceProduction, replaces the sampled output if set
+    store                   :object    # traceability.TraceabilityStore recording produced units, if set
+    fluidgroups             :frozenset # groups produced as continuous flows, i.e. without rounding to units
 
     def __init__(self,
                  id         :int,
@@ -31,7 +34,11 @@ class Manufacturer:
                  gaussian   :bool,
                  l_groups   :list,  # list of str
                  l_probs    :list,  # list of float
-                 shelflife  :inventory.ShelfLife
+                 shelflife  :inventory.ShelfLife,
+                 inventorymodel :type = inventory.Inventory, # inventory backend, e.g. inventory.CohortInventory
+                 rng        :np.random.Generator = None,
+                 productionmodel :object = None,
+                 fluidgroups :list = ()
                  ):
 
         self.id                  = id
@@ -40,44 +47,80 @@ class Manufacturer:
         self.qty_sigma           = qty_sigma
         self.gaussian            = gaussian
         self.d_productionprogram = {l_groups[i]: l_probs[i] for i in range(len(l_groups))}
-        self.inventory           = inventory.Inventory(env= self.env)
+        self.inventory           = inventorymodel(env= self.env)
         self.shelflife           = shelflife
         self.l_processedorders   = deque([])
+        self.rng                 = rng if rng is not None else np.random.default_rng()
+        self.productionmodel     = productionmodel
+        self.store               = None
+        self.fluidgroups         = frozenset(fluidgroups)
 
     def __repr__(self):
 
         return f"manufacturer {self.id}"
     
-    def production(self) -> None:
+    def produce(self) -> None:
         """
         
-        implement simpy process for producing according to production program, on stock (if warehousing capacity available);
+        one day of production according to production program, on stock;
         before production, expired stock in stock is deleted
 
         """
+            
+        # daily housekeeping
+        self.inventory.checkvalidity()
 
-        while True:
+        if self.store is not None: self.store.expire(0, self.env.now)
+
+        # daily production on stock
+        if self.productionmodel is not None:
+
+            for groupstr, qty in zip(self.productionmodel.l_groups, self.productionmodel.get_productionqtys()):
+
+                if qty > 0: self.putaway(groupstr= groupstr, qty= int(qty))
+
+            return
+
+        qty_total= 0
+        if self.gaussian:
+
+            qty_total = self.rng.normal(self.qty_mu, self.qty_sigma)
+        
+        else:
             
-            # daily housekeeping
-            self.inventory.checkvalidity()
+            qty_total = self.rng.lognormal(self.qty_mu, self.qty_sigma)
+
+        for groupstr in self.d_productionprogram.keys():
 
-            # daily production on stock
-            qty_total= 0
-            if self.gaussian:
+            qty = self.d_productionprogram[groupstr]*qty_total
 
-                qty_total = random.gauss(self.qty_mu, self.qty_sigma)
+            if groupstr not in self.fluidgroups: qty = round(qty)
             
-            else:
-                
-                qty_total = np.random.lognormal(self.qty_mu, self.qty_sigma, 1)[0]
+            if qty > 0:
+
+                self.putaway(groupstr= groupstr, qty= qty)
+
+    def putaway(self,
+                groupstr :str,
+                qty      :float
+                ) -> None:
+
+        p = inventory.Product(groupstr= groupstr, date_mfg= self.env.now, date_val= self.env.now+self.shelflife.get_lifetime())
 
-            for groupstr in self.d_productionprogram.keys():
+        self.inventory.putaway(p, qty= qty)
 
-                qty = round(self.d_productionprogram[groupstr]*qty_total)
-                
-                for _ in range(qty):
+        if self.store is not None: self.store.produce(p, qty)
 
-                    self.inventory.putaway(inventory.Product(groupstr= groupstr, date_mfg= self.env.now, date_val= self.env.now+self.shelflife.get_lifetime()))  
+    def production(self) -> None:
+        """
+        
+        implement simpy process for producing according to production program, on stock (if warehousing capacity available)
+
+        """
+
+        while True:
+            
+            self.produce()
             
             yield self.env.timeout(1)
     
@@ -89,4 +132,77 @@ class Manufacturer:
                                        
         self.l_processedorders.append(demand.SalesOrder(t_pref= t_pref, date= self.env.now, product= p))
 
-        return p
\ No newline at end of file
+        return p
+
+    def distribution_batch(self,
+                           l_groups :list,        # list of str
+                           a_qtys   :np.ndarray   # purchase quantity per group, aligned with l_groups
+                           ) -> list:
+        """
+        
+        fills a whole purchase in one call; returns the retrieved products as list of [Product, qty],
+        and records one sales order per retrieved slice plus one per unfulfilled remainder
+
+        """
+
+        l_return = []
+
+        for groupstr, qty in zip(l_groups, a_qtys):
+
+            if qty <= 0: continue
+
+            t_pref = (groupstr, )
+            l_slices = self.inventory.retrieve_batch(t_pref= t_pref, qty= qty)
+            
+            for p, n in l_slices:
+
+                self.l_processedorders.append(demand.SalesOrder(t_pref= t_pref, date= self.env.now, product= p, qty= n))
+                qty -= n
+            
+            if qty > inventory.EPSILON:
+
+                self.l_processedorders.append(demand.SalesOrder(t_pref= t_pref, date= self.env.now, product= None, qty= qty))
+
+            l_return.extend(l_slices)
+
+        return l_return
+
+    def distribution_rationed(self,
+                              l_groups   :list,       # list of str
+                              a_requests :np.ndarray, # (requester, group), purchase quantities aligned with l_groups
+                              rationing  :object      # e.g. allocation.ProportionalRationing
+                              ) -> list:
+        """
+        
+        fills all requesters purchases of a day in one pass, with stock rationed by rationing;
+        returns per requester the retrieved products as list of [Product, qty], and records sales orders as distribution_batch
+
+        """
+
+        a_alloc, a_order = rationing.ration(a_requests= a_requests, a_stock= self.inventory.get_groupqtys(l_groups))
+
+        l_return = [[] for _ in range(len(a_requests))]
+
+        for i_req in a_order:
+
+            for i_group, groupstr in enumerate(l_groups):
+
+                qty = a_requests[i_req, i_group]
+
+                if qty <= 0: continue
+
+                t_pref = (groupstr, )
+                l_slices = self.inventory.retrieve_batch(t_pref= t_pref, qty= a_alloc[i_req, i_group]) if a_alloc[i_req, i_group] > 0 else []
+
+                for p, n in l_slices:
+
+                    self.l_processedorders.append(demand.SalesOrder(t_pref= t_pref, date= self.env.now, product= p, qty= n))
+                    qty -= n
+
+                if qty > inventory.EPSILON:
+
+                    self.l_processedorders.append(demand.SalesOrder(t_pref= t_pref, date= self.env.now, product= None, qty= qty))
+
+                l_return[i_req].extend(l_slices)
+
+        return l_return
@@ -0,0 +1,303 @@
+from array import array
+from itertools import repeat
+import numpy as np
+import pandas as pd
+
+import scmsim.framework.demand as demand
+
+class RecorderChannel:
+
+    """
+
+    stand-in for an entities l_processedorders;
+    forwards every appended sales order to a recorder, tagged with the entity it came from
+
+    """
+
+    recorder :object
+    entity   :str
+
+    def __init__(self,
+                 recorder :object,
+                 entity   :str
+                 ):
+
+        self.recorder = recorder
+        self.entity   = entity
+
+    def append(self,
+               so :demand.SalesOrder
+               ) -> None:
+
+        self.recorder.record(entity= self.entity, so= so)
+
+class AggregateRecorder:
+
+    """
+
+    accumulates sales orders during the run as unit counts per day, entity, preference, product group and fulfillment
+
+    """
+
+    d_counts :dict # key: (entity, day, t_pref, groupstr, fulfilled), value: qty
+
+    def __init__(self):
+
+        self.d_counts = {}
+
+    def channel(self,
+                entity :str
+                ) -> RecorderChannel:
+
+        return RecorderChannel(recorder= self, entity= entity)
+
+    def record(self,
+               entity :str,
+               so     :demand.SalesOrder
+               ) -> None:
+
+        key = (entity, int(so.date), so.t_pref, so.product.groupstr if so.product else None, so.fulfilled)
+        self.d_counts[key] = self.d_counts.get(key, 0) + so.qty
+
+    def to_frame(self) -> pd.DataFrame:
+
+        data = [[entity, day, str(t_pref), str(groupstr), fulfilled, qty] for (entity, day, t_pref, groupstr, fulfilled), qty in self.d_counts.items()]
+
+        df = pd.DataFrame(data, columns= ["entity", "time", "preference", "product", "fulfilled", "qty"])
+
+        return df.sort_values(["entity", "time"], kind= "stable").reset_index(drop= True)
+
+class ArrowRecorder:
+
+    """
+
+    accumulates one row per unit during the run in typed column buffers;
+    entity, preference and product are stored as codes into per-column dictionaries,
+    so to_table can hand them to Arrow as dictionary-encoded columns without per-row conversion
+
+    requires pyarrow, which is only imported when the table is built
+
+    """
+
+    d_dictionaries :dict # key: column name, value: dict of value -> code
+    a_entity       :array
+    a_time         :array
+    a_preference   :array
+    a_product      :array
+    a_fulfilled    :array
+
+    def __init__(self):
+
+        self.d_dictionaries = {"entity": {}, "preference": {}, "product": {}}
+        self.a_entity       = array("i")
+        self.a_time         = array("d")
+        self.a_preference   = array("i")
+        self.a_product      = array("i")
+        self.a_fulfilled    = array("b")
+
+    def channel(self,
+                entity :str
+                ) -> RecorderChannel:
+
+        return RecorderChannel(recorder= self, entity= entity)
+
+    def get_code(self,
+                 column :str,
+                 value  :object
+                 ) -> int:
+
+        d_codes = self.d_dictionaries[column]
+
+        if value not in d_codes:
+
+            d_codes[value] = len(d_codes)
+
+        return d_codes[value]
+
+    def record(self,
+               entity :str,
+               so     :demand.SalesOrder
+               ) -> None:
+
+        n = so.qty
+
+        self.a_entity.extend(repeat(self.get_code("entity", entity), n))
+        self.a_time.extend(repeat(so.date, n))
+        self.a_preference.extend(repeat(self.get_code("preference", so.t_pref), n))
+        self.a_product.extend(repeat(self.get_code("product", so.product.groupstr if so.product else None), n))
+        self.a_fulfilled.extend(repeat(so.fulfilled, n))
+
+    def to_table(self): # -> pyarrow.Table
+
+        import pyarrow as pa
+
+        def dictionary_column(column :str, a_codes :array) -> pa.DictionaryArray:
+
+            # value strings match the per-unit result frame, e.g. "('OPos', 'ONeg')" and "None"
+            l_values = [str(value) for value in self.d_dictionaries[column].keys()]
+
+            return pa.DictionaryArray.from_arrays(pa.array(np.frombuffer(a_codes, dtype= np.int32)), pa.array(l_values, type= pa.string()))
+
+        return pa.table({
+            "entity":     dictionary_column("entity", self.a_entity),
+            "time":       pa.array(np.frombuffer(self.a_time, dtype= np.float64)),
+            "preference": dictionary_column("preference", self.a_preference),
+            "product":    dictionary_column("product", self.a_product),
+            "fulfilled":  pa.array(np.frombuffer(self.a_fulfilled, dtype= np.int8).astype(bool))
+        })
+
+class CountRecorder:
+
+    """
+
+    counts fulfilled and unfulfilled units per entity since the last reset; memory does not grow with the run
+
+    """
+
+    d_fulfilled   :dict # key: entity, value: units
+    d_unfulfilled :dict # key: entity, value: units
+
+    def __init__(self):
+
+        self.d_fulfilled   = {}
+        self.d_unfulfilled = {}
+
+    def channel(self,
+                entity :str
+                ) -> RecorderChannel:
+
+        self.d_fulfilled[entity]   = 0
+        self.d_unfulfilled[entity] = 0
+
+        return RecorderChannel(recorder= self, entity= entity)
+
+    def record(self,
+               entity :str,
+               so     :demand.SalesOrder
+               ) -> None:
+
+        if so.fulfilled:
+
+            self.d_fulfilled[entity] += so.qty
+
+        else:
+
+            self.d_unfulfilled[entity] += so.qty
+
+    def reset(self) -> None:
+
+        for entity in self.d_fulfilled:
+
+            self.d_fulfilled[entity]   = 0
+            self.d_unfulfilled[entity] = 0
+
+class KPIRecorder:
+
+    """
+
+    accumulates key figures during the run per entity and demanded group (first choice of the preference tuple):
+    units demanded, fulfilled, fulfilled by a substitute group, short, and the summed age at issue;
+    outdated units are counted by the inventories and added per product group at the end of the run
+
+    """
+
+    d_counts   :dict # key: (entity, groupstr), value: [demand, fulfilled, substitute, shortage, age sum]
+    d_outdated :dict # key: (entity, groupstr), value: units outdated
+
+    def __init__(self):
+
+        self.d_counts   = {}
+        self.d_outdated = {}
+
+    def channel(self,
+                entity :str
+                ) -> RecorderChannel:
+
+        return RecorderChannel(recorder= self, entity= entity)
+
+    def record(self,
+               entity :str,
+               so     :demand.SalesOrder
+               ) -> None:
+
+        key = (entity, so.t_pref[0])
+        l_counts = self.d_counts.get(key)
+
+        if l_counts is None:
+
+            l_counts = self.d_counts[key] = [0, 0, 0, 0, 0.0]
+
+        l_counts[0] += so.qty
+
+        if so.fulfilled:
+
+            l_counts[1] += so.qty
+            l_counts[4] += (int(so.date) - so.product.date_mfg)*so.qty
+
+            if so.product.groupstr != so.t_pref[0]: l_counts[2] += so.qty
+
+        else:
+
+            l_counts[3] += so.qty
+
+    def record_outdated(self,
+                        entity     :str,
+                        d_outdated :dict # key: groupstr, value: units, e.g. Inventory.d_outdated
+                        ) -> None:
+
+        for groupstr, qty in d_outdated.items():
+
+            self.d_outdated[(entity, groupstr)] = self.d_outdated.get((entity, groupstr), 0) + qty
+
+    def to_frame(self) -> pd.DataFrame:
+
+        data = []
+
+        for key in sorted(set(self.d_counts) | set(self.d_outdated)):
+
+            qty_demand, qty_fulfilled, qty_substitute, qty_shortage, agesum = self.d_counts.get(key, [0, 0, 0, 0, 0.0])
+
+            data.append([*key, qty_demand, qty_fulfilled, qty_substitute, qty_shortage, self.d_outdated.get(key, 0),
+                         qty_fulfilled/qty_demand if qty_demand else np.nan,
+                         agesum/qty_fulfilled if qty_fulfilled else np.nan])
+
+        return pd.DataFrame(data, columns= ["entity", "group", "demand", "fulfilled", "substitute", "shortage", "outdated", "fillrate", "age_at_issue"])
+
+class DaySnapshot:
+
+    """
+
+    compact state of the model at the end of one day, as yielded by api.iter_run
+
+    """
+
+    day           :int
+    d_stock       :dict # key: entity, value: dict of groupstr -> units on stock
+    d_fulfilled   :dict # key: entity, value: units fulfilled today
+    d_unfulfilled :dict # key: entity, value: units not fulfilled today
+    d_outdated    :dict # key: entity, value: units outdated today
+
+    def __init__(self,
+                 day           :int,
+                 d_stock       :dict,
+                 d_fulfilled   :dict,
+                 d_unfulfilled :dict,
+                 d_outdated    :dict
+                 ):
+
+        self.day           = day
+        self.d_stock       = d_stock
+        self.d_fulfilled   = d_fulfilled
+        self.d_unfulfilled = d_unfulfilled
+        self.d_outdated    = d_outdated
+
+    def __repr__(self):
+
+        return f"day {self.day}: fulfilled {self.d_fulfilled}, unfulfilled {self.d_unfulfilled}, outdated {self.d_outdated}"
+
+# result modes of api.run accumulated during the run
+d_recorders = {
+    "aggregated" : AggregateRecorder,
+    "arrow"      : ArrowRecorder,
+    "kpi"        : KPIRecorder
+}
@@ -0,0 +1,273 @@
+import simpy
+import numpy as np
+
+import scmsim.framework.manufacturing  as manufacturing
+
+class NumpyTrace:
+
+    """
+
+    per-day, per-site quantities per column (group) from a .npy file of shape (day, site, column),
+    memory-mapped, so only the days read are paged in
+
+    """
+
+    a_qtys    :np.ndarray # (day, site, column), memory-mapped
+    l_columns :list       # column names, e.g. groupstrs
+    n_days    :int
+    n_sites   :int
+
+    def __init__(self,
+                 path      :str,
+                 l_columns :list # list of str, names of the last axis
+                 ):
+
+        self.a_qtys = np.load(path, mmap_mode= "r")
+
+        if self.a_qtys.ndim != 3 or self.a_qtys.shape[2] != len(l_columns):
+
+            raise ValueError(f"trace {path} has shape {self.a_qtys.shape}, expected (day, site, {len(l_columns)})")
+
+        self.l_columns = list(l_columns)
+        self.n_days, self.n_sites = self.a_qtys.shape[:2]
+
+    def get_qtys(self,
+                 day  :int,
+                 site :int
+                 ) -> np.ndarray:
+
+        return np.asarray(self.a_qtys[day, site], dtype= np.int64)
+
+class ArrowTrace:
+
+    """
+
+    per-day, per-site quantities from an Arrow IPC (Feather V2, uncompressed) file with columns day, site and
+    one integer column per group; rows sorted by day and site, one row per day and site;
+    the file is memory-mapped and every record batch is kept as zero-copy views, indexed by the batches first rows,
+    so columns are never combined or loaded into memory
+
+    requires pyarrow
+
+    """
+
+    l_chunks  :list       # per record batch, per column, np.ndarray view of the mapped file
+    a_offsets :np.ndarray # first row, day*n_sites + site, of each record batch
+    l_columns :list
+    n_days    :int
+    n_sites   :int
+
+    def __init__(self,
+                 path :str
+                 ):
+
+        import pyarrow as pa
+
+        reader    = pa.ipc.open_file(pa.memory_map(path, "r"))
+        l_batches = [b for b in (reader.get_batch(i) for i in range(reader.num_record_batches)) if b.num_rows]
+
+        self.l_columns = [name for name in reader.schema.names if name not in ("day", "site")]
+
+        # sites and rows, one record batch at a time
+        n_rows       = sum(b.num_rows for b in l_batches)
+        self.n_sites = max((int(b.column("site").to_numpy().max()) + 1 for b in l_batches), default= 0)
+        self.n_days  = n_rows // self.n_sites if self.n_sites else 0
+
+        if self.n_days*self.n_sites != n_rows:
+
+            raise ValueError(f"trace {path} must have one row per day and site, sorted by day and site")
+
+        self.l_chunks = []
+        l_offsets     = []
+        i_row         = 0
+
+        for b in l_batches:
+
+            a_rows = np.arange(i_row, i_row + b.num_rows)
+
+            if (b.column("day").to_numpy() != a_rows // self.n_sites).any() or (b.column("site").to_numpy() != a_rows % self.n_sites).any():
+
+                raise ValueError(f"trace {path} must have one row per day and site, sorted by day and site")
+
+            self.l_chunks.append([b.column(name).to_numpy(zero_copy_only= True) for name in self.l_columns])
+            l_offsets.append(i_row)
+            i_row += b.num_rows
+
+        self.a_offsets = np.array(l_offsets, dtype= np.int64)
+
+    def get_qtys(self,
+                 day  :int,
+                 site :int
+                 ) -> np.ndarray:
+
+        i_row   = day*self.n_sites + site
+        i_chunk = np.searchsorted(self.a_offsets, i_row, side= "right") - 1
+        i_row  -= self.a_offsets[i_chunk]
+
+        return np.array([a[i_row] for a in self.l_chunks[i_chunk]], dtype= np.int64)
+
+def load_trace(path      :str,
+               l_columns :list = None # required for .npy files
+               ): # -> NumpyTrace or ArrowTrace
+    """
+
+    opens a trace by file type: .npy as NumpyTrace, anything else as ArrowTrace
+
+    """
+
+    if path.endswith(".npy"):
+
+        if l_columns is None: raise ValueError("l_columns is required for .npy traces")
+
+        return NumpyTrace(path= path, l_columns= l_columns)
+
+    return ArrowTrace(path= path)
+
+class TraceSource:
+
+    """
+
+    reads one sites quantities for the current day from a trace, realigned to the columns a pattern expects;
+    groups missing in the trace read as 0
+
+    """
+
+    env       :simpy.Environment
+    trace     :object # NumpyTrace or ArrowTrace
+    site      :int
+    day_start :int        # trace day replayed on simulation day 0
+    a_idx     :np.ndarray # trace column index per expected column, -1 if missing
+
+    def __init__(self,
+                 env       :simpy.Environment,
+                 trace     :object,
+                 site      :int,
+                 l_columns :list, # list of str
+                 day_start :int = 0
+                 ):
+
+        self.env       = env
+        self.trace     = trace
+        self.site      = site
+        self.day_start = day_start
+        self.a_idx     = np.array([trace.l_columns.index(c) if c in trace.l_columns else -1 for c in l_columns], dtype= int)
+
+    def get_qtys(self) -> np.ndarray:
+
+        a_qtys = self.trace.get_qtys(day= self.day_start + int(self.env.now), site= self.site)
+
+        return np.where(self.a_idx >= 0, a_qtys[self.a_idx], 0)
+
+class TraceDemand:
+
+    """
+
+    replays demand from a trace in place of demand.DemandPattern;
+    trace columns are groups and count demand by first choice of the preference tuples
+
+    """
+
+    l_preferences :list # preference tuples
+    source        :TraceSource
+
+    def __init__(self,
+                 env           :simpy.Environment,
+                 trace         :object,
+                 site          :int,
+                 l_preferences :list, # list of tuples
+                 day_start     :int = 0
+                 ):
+
+        self.l_preferences = list(dict.fromkeys(l_preferences))
+        self.source        = TraceSource(env= env, trace= trace, site= site, l_columns= [t_pref[0] for t_pref in self.l_preferences], day_start= day_start)
+
+    def get_salesorders(self) -> list: # list of tuples
+
+        l_return = []
+
+        for t_pref, qty in zip(self.l_preferences, self.get_salesqtys()):
+
+            l_return.extend([t_pref]*qty)
+
+        return l_return
+
+    def get_salesqtys(self) -> np.ndarray:
+
+        return self.source.get_qtys()
+
+class TraceSupply:
+
+    """
+
+    replays purchases from a trace in place of supply.SupplyPattern
+
+    """
+
+    supplier :manufacturing.Manufacturer
+    l_groups :list
+    source   :TraceSource
+
+    def __init__(self,
+                 env       :simpy.Environment,
+                 supplier  :manufacturing.Manufacturer,
+                 trace     :object,
+                 site      :int,
+                 l_groups  :list, # list of str
+                 day_start :int = 0
+                 ):
+
+        self.supplier = supplier
+        self.l_groups = list(dict.fromkeys(l_groups))
+        self.source   = TraceSource(env= env, trace= trace, site= site, l_columns= self.l_groups, day_start= day_start)
+
+    def get_purchases(self,
+                      date_today :int
+                      ) -> list:
+
+        l_return = []
+
+        for groupstr, qty in zip(self.l_groups, self.get_purchaseqtys()):
+
+            for _ in range(qty):
+
+                p = self.supplier.distribution(t_pref= (groupstr, ))
+
+                if p: l_return.append(p)
+
+        return l_return
+
+    def get_purchaseqtys(self) -> np.ndarray:
+
+        return self.source.get_qtys()
+
+    def get_purchases_batch(self,
+                            date_today :int
+                            ) -> list:
+
+        return self.supplier.distribution_batch(l_groups= self.l_groups, a_qtys= self.get_purchaseqtys())
+
+class TraceProduction:
+
+    """
+
+    replays production from a trace in place of the manufacturers sampled output
+
+    """
+
+    l_groups :list
+    source   :TraceSource
+
+    def __init__(self,
+                 env       :simpy.Environment,
+                 trace     :object,
+                 l_groups  :list, # list of str
+                 site      :int = 0,
+                 day_start :int = 0
+                 ):
+
+        self.l_groups = list(dict.fromkeys(l_groups))
+        self.source   = TraceSource(env= env, trace= trace, site= site, l_columns= self.l_groups, day_start= day_start)
+
+    def get_productionqtys(self) -> np.ndarray:
+
+        return self.source.get_qtys()
@@ -1,5 +1,5 @@
 import simpy
-import random
+import math
 import numpy as np
 
 import scmsim.framework.inventory      as inventory
@@ -19,6 +19,10 @@ class SupplyPattern:
     qty_sigma           :float  # standard deviation from mean daily production output
     gaussian            :bool
     d_productprogram    :dict   # key: groupstr, value (probability)
+    l_groups            :list   # groupstrs, in order of d_productprogram
+    a_probs             :np.ndarray # probabilities, aligned with l_groups
+    rng                 :np.random.Generator # stream for all quantity draws
+    a_fluid             :np.ndarray # bool, aligned with l_groups; quantities of fluid groups are not rounded
 
     def __init__(self, 
                  supplier       :manufacturing.Manufacturer,
@@ -26,7 +30,9 @@ class SupplyPattern:
                  qty_sigma      :float,
                  gaussian       :bool,
                  l_groups       :list, # list of str
-                 l_probs        :list  # list of float
+                 l_probs        :list, # list of float
+                 rng            :np.random.Generator = None,
+                 fluidgroups    :list = () # groups tracked as continuous flows, batched only
                  ):
         
         self.supplier   = supplier
@@ -34,6 +40,10 @@ class SupplyPattern:
         self.qty_sigma  = qty_sigma
         self.gaussian   = gaussian
         self.d_productprogram = {l_groups[i]: l_probs[i] for i in range(len(l_groups))}
+        self.l_groups   = list(self.d_productprogram.keys())
+        self.a_probs    = np.array(list(self.d_productprogram.values()), dtype= float)
+        self.rng        = rng if rng is not None else np.random.default_rng()
+        self.a_fluid    = np.array([g in fluidgroups for g in self.l_groups], dtype= bool)
     
     def get_purchases(self, 
                        date_today :int
@@ -48,9 +58,9 @@ class SupplyPattern:
 
         qty_total = 0
         if self.gaussian:
-            qty_total = random.gauss(mu = self.qty_mu, sigma= self.qty_sigma)
+            qty_total = self.rng.normal(self.qty_mu, self.qty_sigma)
         else:
-            qty_total = np.random.lognormal(self.qty_mu, self.qty_sigma, 1)[0]
+            qty_total = self.rng.lognormal(self.qty_mu, self.qty_sigma)
     
         l_return = []
 
@@ -66,6 +76,39 @@ class SupplyPattern:
 
         return l_return        
 
+    def get_purchaseqtys(self) -> np.ndarray:
+
+        """
+        
+        batched alternative to sampling in get_purchases: returns the days purchase quantities per group,
+        aligned with l_groups, drawn from rng
+
+        """
+
+        if self.gaussian:
+            qty_total = self.rng.normal(self.qty_mu, self.qty_sigma)
+        else:
+            qty_total = self.rng.lognormal(self.qty_mu, self.qty_sigma)
+
+        a_qtys = qty_total*self.a_probs
+
+        if self.a_fluid.any(): return np.maximum(np.where(self.a_fluid, a_qtys, np.round(a_qtys)), 0)
+
+        return np.maximum(np.round(a_qtys), 0).astype(int)
+
+    def get_purchases_batch(self,
+                            date_today :int
+                            ) -> list:
+
+        """
+        
+        batched alternative to get_purchases: places the whole days purchase at the manufacturer in one call;
+        returns the received products as list of [Product, qty]
+
+        """
+
+        return self.supplier.distribution_batch(l_groups= self.l_groups, a_qtys= self.get_purchaseqtys())
+
 class Delivery:
     
     date_arrival :int
@@ -77,4 +120,73 @@ class Delivery:
                 ): 
         
         self.date_arrival = date_arrival
-        self.product      = product
\ No newline at end of file
+        self.product      = product
+
+class DeliveryCalendar:
+
+    """
+    
+    pipeline of in-transit deliveries, bucketed by arrival day; 
+    a delivery arriving at a fractional time is available from the next full day on,
+    and all receipts of one day are released with a single bucket lookup
+
+    """
+
+    d_buckets    :dict # key: arrival day, value: list of [Product, qty]
+    day_released :int  # last day whose bucket was released
+    qty          :int  # units in transit
+
+    def __init__(self):
+
+        self.d_buckets    = {}
+        self.day_released = -1
+        self.qty          = 0
+
+    def put(self,
+            date_arrival :float,
+            product      :inventory.Product,
+            qty          :int = 1
+            ) -> None:
+
+        day = max(math.ceil(date_arrival), self.day_released + 1)
+
+        if day not in self.d_buckets:
+
+            self.d_buckets[day] = []
+
+        bucket = self.d_buckets[day]
+
+        # consecutive units sharing one Product instance (e.g. from a cohort inventory) are kept as one entry
+        if bucket and bucket[-1][0] is product:
+
+            bucket[-1][1] += qty
+
+        else:
+
+            bucket.append([product, qty])
+
+        self.qty += qty
+
+    def release(self,
+                date_today :float
+                ) -> list:
+
+        """
+        
+        returns all deliveries, as [Product, qty], arrived until date_today and removes them from the pipeline
+
+        """
+
+        l_return = []
+
+        for day in range(self.day_released + 1, math.floor(date_today) + 1):
+
+            l_return.extend(self.d_buckets.pop(day, []))
+
+        self.day_released = max(self.day_released, math.floor(date_today))
+
+        for _, qty in l_return:
+
+            self.qty -= qty
+
+        return l_return
@@ -0,0 +1,234 @@
+import math
+import numpy as np
+import pandas as pd
+from collections import deque
+
+import scmsim.framework.inventory as inventory
+
+# one row per unit, index = unit id; -1 marks events that did not happen (yet)
+unit_dtype = np.dtype([
+    ("group",         np.int16), # code into TraceabilityStore.l_groups
+    ("date_mfg",      np.int32),
+    ("date_val",      np.int32),
+    ("warehouse",     np.int16), # receiving warehouse id
+    ("date_shipped",  np.int32), # left the manufacturer
+    ("date_received", np.int32), # arrived at the warehouse
+    ("date_issued",   np.int32)  # issued to demand at the warehouse
+])
+
+class TraceabilityStore:
+
+    """
+
+    records the lifecycle of every unit in a growable structured array (unit_dtype, 24 bytes per unit);
+    units are numbered at production, in blocks per production batch
+
+    units sharing group and dates are interchangeable in the model, so shipments and issues take the lowest
+    unused ids of their batch at the manufacturer or warehouse; ids per location are kept as ranges, merged when
+    adjacent and dropped when the units expire, which is what keeps the store from holding a reference per unit
+
+    """
+
+    a_units  :np.ndarray # unit_dtype, capacity rows, the first n_units in use
+    n_units  :int
+    l_groups :list       # groupstrs, index = group code
+    d_codes  :dict       # key: groupstr, value: group code
+    d_ranges :dict       # key: location, 0 is the manufacturer, value: dict of (groupstr, date_mfg, date_val) -> deque of [id_first, id_end]
+
+    def __init__(self,
+                 capacity :int = 2**16 # initial rows, doubled when full
+                 ):
+
+        self.a_units  = np.full(capacity, -1, dtype= unit_dtype)
+        self.n_units  = 0
+        self.l_groups = []
+        self.d_codes  = {}
+        self.d_ranges = {}
+
+    def reserve(self,
+                qty :int
+                ) -> None:
+
+        if self.n_units + qty <= len(self.a_units): return
+
+        a_units = np.full(max(2*len(self.a_units), self.n_units + qty), -1, dtype= unit_dtype)
+        a_units[:self.n_units] = self.a_units[:self.n_units]
+
+        self.a_units = a_units
+
+    def put(self,
+            location :int,
+            key      :tuple,
+            id_first :int,
+            id_end   :int
+            ) -> None:
+        """
+
+        adds the ids id_first to id_end to the ranges under location and key, extending the last range if adjacent
+
+        """
+
+        l_ranges = self.d_ranges.setdefault(location, {}).setdefault(key, deque([]))
+
+        if l_ranges and l_ranges[-1][1] == id_first:
+
+            l_ranges[-1][1] = id_end
+
+        else:
+
+            l_ranges.append([id_first, id_end])
+
+    def take(self,
+             location :int,
+             key      :tuple,
+             qty      :int
+             ) -> list:
+        """
+
+        removes up to qty ids from the ranges under location and key; returns list of [id_first, id_end], adjacent ranges merged
+
+        """
+
+        d_keys   = self.d_ranges.get(location, {})
+        l_ranges = d_keys.get(key)
+        l_return = []
+
+        while qty > 0 and l_ranges:
+
+            l_range = l_ranges[0]
+            n = min(qty, l_range[1] - l_range[0])
+
+            if l_return and l_return[-1][1] == l_range[0]:
+
+                l_return[-1][1] += n
+
+            else:
+
+                l_return.append([l_range[0], l_range[0] + n])
+
+            l_range[0] += n
+            qty        -= n
+
+            if l_range[0] == l_range[1]: l_ranges.popleft()
+
+        if l_ranges is not None and not l_ranges: del d_keys[key]
+
+        return l_return
+
+    def expire(self,
+               location :int,
+               date     :float
+               ) -> None:
+        """
+
+        drops the ranges of units at location that expired by date, under the rule of Inventory.checkvalidity;
+        their ids can no longer be shipped or issued
+
+        """
+
+        d_keys = self.d_ranges.get(location, {})
+
+        for key in [key for key in d_keys if date > key[2]]:
+
+            del d_keys[key]
+
+    def produce(self,
+                p   :inventory.Product,
+                qty :int
+                ) -> None:
+
+        if p.groupstr not in self.d_codes:
+
+            self.d_codes[p.groupstr] = len(self.l_groups)
+            self.l_groups.append(p.groupstr)
+
+        self.reserve(qty)
+
+        a_new = self.a_units[self.n_units:self.n_units + qty]
+        a_new["group"]    = self.d_codes[p.groupstr]
+        a_new["date_mfg"] = p.date_mfg
+        a_new["date_val"] = p.date_val
+
+        self.put(0, (p.groupstr, p.date_mfg, p.date_val), self.n_units, self.n_units + qty)
+        self.n_units += qty
+
+    def receive(self,
+                p             :inventory.Product,
+                qty           :int,
+                warehouse     :int,
+                date_shipped  :float,
+                date_received :float
+                ) -> None:
+
+        key = (p.groupstr, p.date_mfg, p.date_val)
+
+        for id_first, id_end in self.take(0, key, qty):
+
+            a_units = self.a_units[id_first:id_end]
+            a_units["warehouse"]     = warehouse
+            a_units["date_shipped"]  = math.floor(date_shipped)
+            a_units["date_received"] = math.ceil(date_received)
+
+            self.put(warehouse, key, id_first, id_end)
+
+    def issue(self,
+              p         :inventory.Product,
+              qty       :int,
+              warehouse :int,
+              date      :float
+              ) -> None:
+
+        for id_first, id_end in self.take(warehouse, (p.groupstr, p.date_mfg, p.date_val), qty):
+
+            self.a_units["date_issued"][id_first:id_end] = math.floor(date)
+
+    @property
+    def units(self) -> np.ndarray:
+        """
+
+        the recorded units, a view indexed by unit id
+
+        """
+
+        return self.a_units[:self.n_units]
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+
+        returns one row per unit with column uid, group as categorical and missing dates as <NA>
+
+        """
+
+        a_units = self.units
+        df = pd.DataFrame({"uid": np.arange(self.n_units)})
+        df["group"] = pd.Categorical.from_codes(a_units["group"], categories= self.l_groups)
+
+        for name in unit_dtype.names[1:]:
+
+            df[name] = pd.arrays.IntegerArray(a_units[name].copy(), a_units[name] < 0)
+
+        return df
+
+    def to_parquet(self,
+                   path :str
+                   ) -> None:
+        """
+
+        writes the units to a Parquet file, group dictionary-encoded, missing dates as nulls; requires pyarrow
+
+        """
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        a_units = self.units
+        d_columns = {
+            "uid":   pa.array(np.arange(self.n_units, dtype= np.int64)),
+            "group": pa.DictionaryArray.from_arrays(pa.array(a_units["group"]), pa.array(self.l_groups, type= pa.string()))
+        }
+
+        for name in unit_dtype.names[1:]:
+
+            d_columns[name] = pa.array(a_units[name], mask= a_units[name] < 0)
+
+        pq.write_table(pa.table(d_columns), path)
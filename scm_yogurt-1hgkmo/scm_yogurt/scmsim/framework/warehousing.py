@@ -1,9 +1,10 @@
 import simpy
-import random
+import numpy as np
 from collections import deque
 import scmsim.framework.inventory as inventory
 import scmsim.framework.demand    as demand
 import scmsim.framework.supply    as supply
+import scmsim.framework.allocation as allocation
         
 class Warehouse:
 
@@ -12,18 +13,27 @@ class Warehouse:
     env                 :simpy.Environment
     demandmodel         :demand.DemandPattern
     supplymodel         :supply.SupplyPattern
-    leadtime            :int  # supply leadtime to this warehouse
+    leadtime            :float # supply leadtime to this warehouse, or callable returning a sampled leadtime
+
+    batched             :bool # if true, purchases and demand are sampled and filled as quantities per group
+    rng                 :np.random.Generator # stream for the daily ordering jitter
+    allocator           :allocation.SubstitutionAllocator # allocates batched demand to stock
 
     inventory           :inventory.Inventory
-    l_deliveries        :deque # list of supply.Delivery
-    l_processedorders   :deque # list of demand.SalesOrder
+    deliveries          :supply.DeliveryCalendar
+    l_processedorders   :deque # list of demand.SalesOrder, or a recording.RecorderChannel
+    store               :object # traceability.TraceabilityStore recording received and issued units, if set
 
     def __init__(self,
                  id            :int,
                  env           :simpy.Environment,
                  demandmodel   :demand.DemandPattern, 
                  supplymodel   :supply.SupplyPattern,
-                 leadtime      :int
+                 leadtime      :float,
+                 inventorymodel :type = inventory.Inventory, # inventory backend, e.g. inventory.CohortInventory
+                 batched       :bool = False,
+                 rng           :np.random.Generator = None,
+                 allocator     :allocation.SubstitutionAllocator = None # default: strict preference order
                  ):
         
         self.id                = id
@@ -32,43 +42,132 @@ class Warehouse:
         self.demandmodel       = demandmodel
         self.supplymodel       = supplymodel
         self.leadtime          = leadtime
+        self.batched           = batched
+        self.rng               = rng if rng is not None else np.random.default_rng()
+        self.allocator         = allocator if allocator is not None else allocation.SubstitutionAllocator(l_preferences= demandmodel.l_preferences)
         
-        self.inventory         = inventory.Inventory(env= self.env)
-        self.l_deliveries      = deque([])
+        self.inventory         = inventorymodel(env= self.env)
+        self.deliveries        = supply.DeliveryCalendar()
         self.l_processedorders = deque([])
+        self.store             = None
 
     def __repr__(self):
 
         return f"warehouse {self.id}"
 
-    def warehousing(self):
+    def get_leadtime(self) -> float:
 
-        while True: # runs for duration of simulation
+        if callable(self.leadtime):
 
-            # randomize the order that warehouses order in, so that when several warehouses order at the same supplier the order is random
-            t_diff = random.uniform(0.0001, 0.001)
-            yield self.env.timeout(t_diff)
+            return self.leadtime()
+
+        return self.leadtime
+
+    def consume_batch(self) -> None:
+        """
+        
+        consumes the days demand in one allocation over all preference tuples and groups;
+        records one sales order per retrieved slice plus one per unfulfilled remainder
+
+        """
+
+        a_demand = self.demandmodel.get_salesqtys()
+        a_alloc  = self.allocator.allocate(a_demand= a_demand, a_stock= self.inventory.get_groupqtys(self.allocator.l_groups))
+
+        for i_pref, t_pref in enumerate(self.allocator.l_preferences):
+
+            qty = a_demand[i_pref]
+
+            if qty <= 0: continue
+
+            for i_group in self.allocator.l_ranked[i_pref]:
+
+                if a_alloc[i_pref, i_group] <= 0: continue
+
+                for p, n in self.inventory.retrieve_batch(t_pref= (self.allocator.l_groups[i_group], ), qty= a_alloc[i_pref, i_group]):
+
+                    self.l_processedorders.append(demand.SalesOrder(t_pref= t_pref, date= self.env.now, product= p, qty= n))
+                    qty -= n
+
+                    if self.store is not None: self.store.issue(p, n, warehouse= self.id, date= self.env.now)
+            
+            if qty > inventory.EPSILON:
+
+                self.l_processedorders.append(demand.SalesOrder(t_pref= t_pref, date= self.env.now, product= None, qty= qty))
+
+    def accept_purchase(self,
+                        l_slices :list # list of [Product, qty]
+                        ) -> None:
+        """
+        
+        puts products purchased today in transit, arriving after the leadtime
+
+        """
+
+        date_arrival = int(self.env.now) + self.get_leadtime()
 
-            # create one supply sample, update incoming deliveries
-            for p in self.supplymodel.get_purchases(date_today= self.env.now):
+        for p, qty in l_slices:
 
-                self.l_deliveries.append(supply.Delivery(date_arrival= self.env.now + self.leadtime, product= p))
+            self.deliveries.put(date_arrival= date_arrival, product= p, qty= qty)
 
-            # check deliveries and update inventory and deliveries
-            for d in list(self.l_deliveries):
+            if self.store is not None: self.store.receive(p, qty, warehouse= self.id, date_shipped= self.env.now, date_received= date_arrival)
 
-                if d.date_arrival <= self.env.now:
-                    
-                    self.inventory.putaway(d.product)
-                    self.l_deliveries.remove(d)
+    def purchase(self) -> None:
+        """
+        
+        creates one supply sample, places it at the supplier and updates incoming deliveries
+
+        """
+
+        if self.batched:
+
+            self.accept_purchase(self.supplymodel.get_purchases_batch(date_today= self.env.now))
+        
+        else:
+
+            self.accept_purchase([p, 1] for p in self.supplymodel.get_purchases(date_today= self.env.now))
+
+    def operate(self) -> None:
+        """
+        
+        daily operations after purchasing: receipts, housekeeping and consumer demand
+
+        """
+
+        # release todays deliveries and update inventory
+        for p, qty in self.deliveries.release(date_today= self.env.now):
+            
+            self.inventory.putaway(p, qty= qty)
+
+        # check validity and update inventory
+        self.inventory.checkvalidity()
+
+        if self.store is not None: self.store.expire(self.id, self.env.now)
 
-            # check validity and update inventory
-            self.inventory.checkvalidity()
+        # create on demand sample; consume demand, update inventory, update l_processedorders
+        if self.batched:
+
+            self.consume_batch()
+        
+        else:
 
-            # create on demand sample; consume demand, update inventory, update l_processedorders
             for t_pref in self.demandmodel.get_salesorders(): 
                 
-                self.l_processedorders.append(demand.SalesOrder(t_pref= t_pref, date= self.env.now, product= self.inventory.retrieve(t_pref)))
+                p = self.inventory.retrieve(t_pref)
+                self.l_processedorders.append(demand.SalesOrder(t_pref= t_pref, date= self.env.now, product= p))
+
+                if p and self.store is not None: self.store.issue(p, 1, warehouse= self.id, date= self.env.now)
+
+    def warehousing(self):
+
+        while True: # runs for duration of simulation
+
+            # randomize the order that warehouses order in, so that when several warehouses order at the same supplier the order is random
+            t_diff = self.rng.uniform(0.0001, 0.001)
+            yield self.env.timeout(t_diff)
+
+            self.purchase()
+            self.operate()
                 
             # yield one step iteration
             yield self.env.timeout(1-t_diff)
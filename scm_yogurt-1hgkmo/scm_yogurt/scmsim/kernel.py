@@ -0,0 +1,411 @@
+import numpy as np
+import pandas as pd
+
+import scmsim.framework.allocation as allocation
+
+class DayStepKernel:
+
+    """
+
+    SimPy-free engine advancing the manufacturer and all warehouses one day at a time;
+    stock is held as NumPy arrays of unit counts per group and manufacturing day,
+    with a leading batch axis so several independent replications are stepped together;
+    quantity parameters and lifetime may be given per batch member as arrays of shape (batch, ),
+    leadtimes as (batch, warehouse), so whole scenario sweeps run as one batch
+
+    for importance sampling, the standard normal behind each quantity draw can be shifted by a tilt per stream
+    ("mfg", "dmnd", "supplier"; in units of sigma, e.g. {"dmnd": 0.5, "mfg": -0.5}); the log likelihood ratio of 
+    every batch member is tracked in a_loglr, and stock-out days per warehouse and first-choice group are 
+    accumulated weighted by it (a_logstockoutdays, a_logstockoutfirst), so their batch means are unbiased for the untilted model;
+    the weighted sums are kept as logarithms, since likelihood ratios over long horizons overflow or underflow
+
+    manufacturing days are stored in a ring of n_slots = max lifetime + max leadtime + 1 slots,
+    which is long enough that no live unit, in stock or in transit, shares a slot with another manufacturing day
+
+    the daily sequence mirrors the SimPy model:
+    - manufacturer: remove units older than lifetime, produce
+    - warehouses, in random order: purchase at the manufacturer (FIFO), receive todays deliveries,
+      remove units of age lifetime or older, allocate demand to groups (allocation.SubstitutionAllocator), FIFO within each group
+
+    """
+
+    n_batch        :int
+    l_groups       :list # groupstrs, index = group axis
+    l_preferences  :list # preference tuples, index = preference axis
+    n_warehouses   :int
+    n_slots        :int
+    n_ring         :int  # pipeline ring length, max arrival offset + 1
+    day            :int
+    rng            :np.random.Generator
+
+    a_mfgshares    :np.ndarray # (group)
+    a_supshares    :np.ndarray # (group)
+    a_dmndprobs    :np.ndarray # (preference)
+    a_offsets      :np.ndarray # (batch, warehouse), delivery offset in days
+    a_lifetime     :np.ndarray # (batch)
+    allocator      :allocation.SubstitutionAllocator
+
+    a_mfgstock     :np.ndarray # (batch, group, slot)
+    a_whstock      :np.ndarray # (batch, warehouse, group, slot)
+    a_pipeline     :np.ndarray # (batch, warehouse, ring, group, slot)
+
+    l_mfgfulfilled :list # per day, (batch, group)
+    l_mfgshort     :list # per day, (batch, group)
+    l_mfgoutdated  :list # per day, (batch, group)
+    l_whserved     :list # per day, (batch, warehouse, preference, group)
+    l_whshort      :list # per day, (batch, warehouse, preference)
+    l_whoutdated   :list # per day, (batch, warehouse, group)
+    keep_days      :bool # if false, the per day lists stay empty and only the run totals below are kept
+    d_totals       :dict # key: name of the per day list, value: its sum over all days so far
+
+    d_tilts         :dict       # key: stream, value: shift of the underlying standard normal
+    a_loglr         :np.ndarray # (batch), log likelihood ratio of the untilted to the tilted model, up to today
+    a_firstgroup    :np.ndarray # (preference, group), 1 where group is the first choice
+    a_logstockoutdays  :np.ndarray # (batch, warehouse, group), log of the sum over days of stock-out indicator * likelihood ratio up to that day, -inf if none
+    a_logstockoutfirst :np.ndarray # (batch, warehouse, group), log likelihood ratio at the first stock-out day, -inf if none
+
+    def __init__(self,
+                 mfgqty_mu           :float,
+                 mfgqty_sigma        :float,
+                 mfg_normal          :bool,
+                 l_mfggroups         :list,
+                 l_mfgshares         :list,
+                 lifetime            :int,
+                 dmndqty_mu          :float,
+                 dmndqty_sigma       :float,
+                 dmnd_normal         :bool,
+                 l_dmndprefs         :list,
+                 l_dmndprefprobs     :list,
+                 n_warehouses        :int,
+                 supplierqty_mu      :float,
+                 supplierqty_sigma   :float,
+                 supplier_normal     :bool,
+                 l_supplyprodgroups  :list,
+                 l_supplyprodshares  :list,
+                 l_deliveryleadtimes :list,
+                 n_batch             :int = 1,
+                 rng                 :np.random.Generator = None,
+                 allocation_rule     :str = "preference",
+                 keep_days           :bool = True,
+                 d_tilts             :dict = None
+                 ):
+
+        def per_batch(x) -> np.ndarray:
+
+            return np.broadcast_to(np.asarray(x, dtype= float), (n_batch, )).copy()
+
+        self.mfgqty_mu         = per_batch(mfgqty_mu)
+        self.mfgqty_sigma      = per_batch(mfgqty_sigma)
+        self.mfg_normal        = mfg_normal
+        self.a_lifetime        = per_batch(lifetime).astype(int)
+        self.dmndqty_mu        = per_batch(dmndqty_mu)
+        self.dmndqty_sigma     = per_batch(dmndqty_sigma)
+        self.dmnd_normal       = dmnd_normal
+        self.supplierqty_mu    = per_batch(supplierqty_mu)
+        self.supplierqty_sigma = per_batch(supplierqty_sigma)
+        self.supplier_normal   = supplier_normal
+        self.n_warehouses      = n_warehouses
+        self.n_batch           = n_batch
+        self.rng               = rng if rng is not None else np.random.default_rng()
+
+        # same de-duplication as the dicts built by the framework classes
+        d_mfgprogram = {l_mfggroups[i]: l_mfgshares[i] for i in range(len(l_mfggroups))}
+        d_supprogram = {l_supplyprodgroups[i]: l_supplyprodshares[i] for i in range(len(l_supplyprodgroups))}
+        d_dmndprogram = {l_dmndprefs[i]: l_dmndprefprobs[i] for i in range(len(l_dmndprefs))}
+
+        self.l_groups = list(d_mfgprogram.keys())
+
+        for groupstr in list(d_supprogram.keys()) + [g for t_pref in d_dmndprogram.keys() for g in t_pref]:
+
+            if groupstr not in self.l_groups: self.l_groups.append(groupstr)
+
+        self.l_preferences = list(d_dmndprogram.keys())
+
+        self.a_mfgshares = np.array([d_mfgprogram.get(g, 0.0) for g in self.l_groups], dtype= float)
+        self.a_supshares = np.array([d_supprogram.get(g, 0.0) for g in self.l_groups], dtype= float)
+        self.a_dmndprobs = np.array([d_dmndprogram[t_pref] for t_pref in self.l_preferences], dtype= float)
+
+        self.allocator = allocation.SubstitutionAllocator(l_preferences= self.l_preferences, l_groups= self.l_groups, rule= allocation_rule)
+
+        for leadtime in np.ravel(np.asarray(l_deliveryleadtimes, dtype= object)):
+
+            if callable(leadtime): raise ValueError("the day-stepping kernel supports numeric leadtimes only")
+
+        a_leadtimes    = np.asarray(l_deliveryleadtimes, dtype= float)[..., :n_warehouses]
+        self.a_offsets = np.broadcast_to(np.ceil(a_leadtimes).astype(int), (n_batch, n_warehouses)).copy()
+        self.n_ring    = int(self.a_offsets.max()) + 1 if n_warehouses > 0 else 1
+        self.n_slots   = int(self.a_lifetime.max()) + self.n_ring
+
+        n_groups = len(self.l_groups)
+        self.day        = 0
+        self.a_mfgstock = np.zeros((n_batch, n_groups, self.n_slots), dtype= np.int64)
+        self.a_whstock  = np.zeros((n_batch, n_warehouses, n_groups, self.n_slots), dtype= np.int64)
+        self.a_pipeline = np.zeros((n_batch, n_warehouses, self.n_ring, n_groups, self.n_slots), dtype= np.int64)
+
+        self.l_mfgfulfilled = []
+        self.l_mfgshort     = []
+        self.l_mfgoutdated  = []
+        self.l_whserved     = []
+        self.l_whshort      = []
+        self.l_whoutdated   = []
+        self.keep_days      = keep_days
+        self.d_totals       = {}
+
+        self.d_tilts = dict(d_tilts or {})
+
+        for stream in self.d_tilts:
+
+            if stream not in ("mfg", "dmnd", "supplier"):
+
+                raise ValueError(f"unknown stream to tilt: {stream}, choose from ['mfg', 'dmnd', 'supplier']")
+
+        self.a_loglr         = np.zeros(n_batch)
+        self.a_firstgroup    = np.array([[g == t_pref[0] for g in self.l_groups] for t_pref in self.l_preferences], dtype= np.int64)
+        self.a_logstockoutdays  = np.full((n_batch, n_warehouses, n_groups), -np.inf)
+        self.a_logstockoutfirst = np.full((n_batch, n_warehouses, n_groups), -np.inf)
+
+    def draw_totals(self,
+                    mu     :float,
+                    sigma  :float,
+                    normal :bool,
+                    size   :tuple,
+                    stream :str = None # key into d_tilts
+                    ) -> np.ndarray:
+
+        # per batch parameters broadcast over the remaining axes
+        mu    = mu.reshape((-1, ) + (1, )*(len(size) - 1))
+        sigma = sigma.reshape((-1, ) + (1, )*(len(size) - 1))
+
+        tilt = self.d_tilts.get(stream, 0.0)
+
+        if tilt:
+
+            # z ~ N(tilt, 1) instead of N(0, 1); the likelihood ratio per draw is exp(-tilt*z + tilt**2/2)
+            a_z = self.rng.standard_normal(size) + tilt
+            self.a_loglr += (-tilt*a_z + tilt**2/2).reshape(size[0], -1).sum(axis= 1)
+
+            return mu + sigma*a_z if normal else np.exp(mu + sigma*a_z)
+
+        if normal:
+
+            return self.rng.normal(mu, sigma, size)
+
+        return self.rng.lognormal(mu, sigma, size)
+
+    def get_ages(self) -> np.ndarray:
+        """
+
+        returns the age in days of the units in each slot, for today
+
+        """
+
+        return (self.day - np.arange(self.n_slots)) % self.n_slots
+
+    def get_fifoorder(self) -> np.ndarray:
+        """
+
+        returns slot indices ordered from oldest to youngest manufacturing day
+
+        """
+
+        return (self.day + 1 + np.arange(self.n_slots)) % self.n_slots
+
+    @staticmethod
+    def take_fifo(a_stock :np.ndarray, # (..., slot), in FIFO order
+                  a_qty   :np.ndarray  # (...)
+                  ) -> np.ndarray:
+        """
+
+        returns the units taken per slot when a_qty units are retrieved oldest first
+
+        """
+
+        a_before = np.cumsum(a_stock, axis= -1) - a_stock
+
+        return np.clip(a_qty[..., None] - a_before, 0, a_stock)
+
+    def record(self,
+               name    :str,
+               a_today :np.ndarray
+               ) -> None:
+
+        if self.keep_days: getattr(self, name).append(a_today)
+
+        self.d_totals[name] = self.d_totals[name] + a_today if name in self.d_totals else a_today.copy()
+
+    def step(self) -> None:
+        """
+
+        advances the model by one day
+
+        """
+
+        n_batch, n_wh, n_groups, n_slots = self.n_batch, self.n_warehouses, len(self.l_groups), self.n_slots
+        a_ages  = self.get_ages()
+        a_order = self.get_fifoorder()
+
+        # manufacturer: housekeeping, then production into todays slot
+        a_expire = (a_ages > self.a_lifetime[:, None])[:, None, :] # (batch, 1, slot)
+        self.record("l_mfgoutdated", (self.a_mfgstock*a_expire).sum(axis= -1))
+        self.a_mfgstock[np.broadcast_to(a_expire, self.a_mfgstock.shape)] = 0
+
+        a_total = self.draw_totals(self.mfgqty_mu, self.mfgqty_sigma, self.mfg_normal, (n_batch, ), "mfg")
+        self.a_mfgstock[:, :, self.day % n_slots] += np.maximum(np.round(a_total[:, None]*self.a_mfgshares), 0).astype(np.int64)
+
+        # warehouses purchase in random order; each takes its interval of the manufacturers FIFO queue
+        a_total = self.draw_totals(self.supplierqty_mu, self.supplierqty_sigma, self.supplier_normal, (n_batch, n_wh), "supplier")
+        a_requests = np.maximum(np.round(a_total[:, :, None]*self.a_supshares), 0).astype(np.int64) # (batch, warehouse, group)
+        a_perm = np.argsort(self.rng.random((n_batch, n_wh)), axis= 1)
+
+        a_reqperm = np.take_along_axis(a_requests, a_perm[:, :, None], axis= 1).transpose(0, 2, 1) # (batch, group, warehouse)
+        a_reqhigh = np.cumsum(a_reqperm, axis= -1)
+        a_reqlow  = a_reqhigh - a_reqperm
+        a_stock   = self.a_mfgstock[:, :, a_order] # (batch, group, slot)
+        a_stkhigh = np.cumsum(a_stock, axis= -1)
+        a_stklow  = a_stkhigh - a_stock
+
+        a_alloc = np.clip(
+                        np.minimum(a_reqhigh[..., :, None], a_stkhigh[..., None, :]) - np.maximum(a_reqlow[..., :, None], a_stklow[..., None, :]),
+                        0, None
+                        ) # (batch, group, warehouse in purchase order, slot in FIFO order)
+
+        self.a_mfgstock[:, :, a_order] -= a_alloc.sum(axis= 2)
+
+        a_fulfilled = a_alloc.sum(axis= (2, 3))
+        self.record("l_mfgfulfilled", a_fulfilled)
+        self.record("l_mfgshort", a_requests.sum(axis= 1) - a_fulfilled)
+
+        # back to warehouse order and slot order, then into the pipeline
+        a_inverse = np.argsort(a_perm, axis= 1)
+        a_alloc   = np.take_along_axis(a_alloc, a_inverse[:, None, :, None], axis= 2).transpose(0, 2, 1, 3) # (batch, warehouse, group, FIFO slot)
+        a_slotted = np.empty_like(a_alloc)
+        a_slotted[..., a_order] = a_alloc
+
+        # every (batch, warehouse) pair occurs once, so the fancy-indexed += does not drop units
+        self.a_pipeline[np.arange(n_batch)[:, None], np.arange(n_wh)[None, :], (self.day + self.a_offsets) % self.n_ring] += a_slotted
+
+        # receipts and housekeeping
+        self.a_whstock += self.a_pipeline[:, :, self.day % self.n_ring]
+        self.a_pipeline[:, :, self.day % self.n_ring] = 0
+
+        a_expire = (a_ages >= self.a_lifetime[:, None])[:, None, None, :] # (batch, 1, 1, slot)
+        self.record("l_whoutdated", (self.a_whstock*a_expire).sum(axis= -1))
+        self.a_whstock[np.broadcast_to(a_expire, self.a_whstock.shape)] = 0
+
+        # demand, allocated to group stock totals in one pass, then taken oldest first within each group
+        a_total = self.draw_totals(self.dmndqty_mu, self.dmndqty_sigma, self.dmnd_normal, (n_batch, n_wh), "dmnd")
+        a_demand = np.maximum(np.round(a_total[:, :, None]*self.a_dmndprobs), 0).astype(np.int64) # (batch, warehouse, preference)
+
+        a_served = self.allocator.allocate(a_demand= a_demand, a_stock= self.a_whstock.sum(axis= -1)) # (batch, warehouse, preference, group)
+        a_stock  = self.a_whstock[..., a_order] # (batch, warehouse, group, FIFO slot)
+
+        self.a_whstock[..., a_order] = a_stock - self.take_fifo(a_stock, a_served.sum(axis= 2))
+        self.record("l_whserved", a_served)
+        a_short = a_demand - a_served.sum(axis= -1)
+        self.record("l_whshort", a_short)
+
+        # stock-out days per first-choice group, weighted by the likelihood ratio up to today
+        a_stockout = (a_short @ self.a_firstgroup) > 0 # (batch, warehouse, group)
+        a_loglr    = np.broadcast_to(self.a_loglr[:, None, None], a_stockout.shape)
+
+        self.a_logstockoutdays  = np.where(a_stockout, np.logaddexp(self.a_logstockoutdays, a_loglr), self.a_logstockoutdays)
+        self.a_logstockoutfirst = np.where(a_stockout & np.isneginf(self.a_logstockoutfirst), a_loglr, self.a_logstockoutfirst)
+
+        self.day += 1
+
+    def run(self,
+            simlength :int
+            ) -> None:
+
+        while self.day < simlength:
+
+            self.step()
+
+    def to_summary(self) -> pd.DataFrame:
+        """
+
+        returns run totals per batch member and entity: units demanded, fulfilled, fulfilled by a substitute
+        (a group other than the first choice), short and outdated, and the fill rate
+
+        """
+
+        if self.day == 0:
+
+            return pd.DataFrame(columns= ["batch", "entity", "demand", "fulfilled", "substitute", "shortage", "outdated", "fillrate"])
+
+        d_totals = self.d_totals
+
+        a_first = np.array([[g == t_pref[0] for g in self.l_groups] for t_pref in self.l_preferences]) # (preference, group)
+
+        # entity axis: manufacturer first, then warehouses
+        a_fulfilled  = np.concatenate([d_totals["l_mfgfulfilled"].sum(axis= -1)[:, None], d_totals["l_whserved"].sum(axis= (2, 3))], axis= 1)
+        a_substitute = np.concatenate([np.zeros((self.n_batch, 1), dtype= np.int64), (d_totals["l_whserved"]*~a_first).sum(axis= (2, 3))], axis= 1)
+        a_shortage   = np.concatenate([d_totals["l_mfgshort"].sum(axis= -1)[:, None], d_totals["l_whshort"].sum(axis= -1)], axis= 1)
+        a_outdated   = np.concatenate([d_totals["l_mfgoutdated"].sum(axis= -1)[:, None], d_totals["l_whoutdated"].sum(axis= -1)], axis= 1)
+        a_demand     = a_fulfilled + a_shortage
+
+        l_entities = ["manufacturer 1"] + [f"warehouse {i_wh+1}" for i_wh in range(self.n_warehouses)]
+
+        with np.errstate(invalid= "ignore", divide= "ignore"):
+
+            a_fillrate = np.where(a_demand > 0, a_fulfilled/a_demand, np.nan)
+
+        return pd.DataFrame({
+            "batch":      np.repeat(np.arange(self.n_batch), len(l_entities)),
+            "entity":     np.tile(l_entities, self.n_batch),
+            "demand":     a_demand.ravel(),
+            "fulfilled":  a_fulfilled.ravel(),
+            "substitute": a_substitute.ravel(),
+            "shortage":   a_shortage.ravel(),
+            "outdated":   a_outdated.ravel(),
+            "fillrate":   a_fillrate.ravel()
+        })
+
+    def to_frame(self,
+                 batch :int = 0
+                 ) -> pd.DataFrame:
+        """
+
+        returns the results of one batch member in the format of api.run(result_mode= "aggregated"):
+        unit counts per entity, day, preference, product and fulfillment; requires keep_days
+
+        """
+
+        if not self.keep_days: raise ValueError("to_frame requires a kernel created with keep_days= True, use to_summary")
+
+        a_groups = np.array(self.l_groups, dtype= object)
+        a_mfgprefs = np.array([str((g, )) for g in self.l_groups], dtype= object)
+        a_whprefs  = np.array([str(t_pref) for t_pref in self.l_preferences], dtype= object)
+        a_whs      = np.array([f"warehouse {i_wh+1}" for i_wh in range(self.n_warehouses)], dtype= object)
+
+        l_frames = []
+
+        def append(a_entity, a_day, a_pref, a_product, fulfilled, a_qty):
+
+            l_frames.append(pd.DataFrame({"entity": a_entity, "time": a_day, "preference": a_pref, "product": a_product, "fulfilled": fulfilled, "qty": a_qty}))
+
+        if self.day > 0:
+
+            a_qtys = np.stack(self.l_mfgfulfilled)[:, batch]
+            a_day, a_group = np.nonzero(a_qtys)
+            append("manufacturer 1", a_day, a_mfgprefs[a_group], a_groups[a_group], True, a_qtys[a_day, a_group])
+
+            a_qtys = np.stack(self.l_mfgshort)[:, batch]
+            a_day, a_group = np.nonzero(a_qtys)
+            append("manufacturer 1", a_day, a_mfgprefs[a_group], "None", False, a_qtys[a_day, a_group])
+
+            a_qtys = np.stack(self.l_whserved)[:, batch]
+            a_day, a_wh, a_pref, a_group = np.nonzero(a_qtys)
+            append(a_whs[a_wh], a_day, a_whprefs[a_pref], a_groups[a_group], True, a_qtys[a_day, a_wh, a_pref, a_group])
+
+            a_qtys = np.stack(self.l_whshort)[:, batch]
+            a_day, a_wh, a_pref = np.nonzero(a_qtys)
+            append(a_whs[a_wh], a_day, a_whprefs[a_pref], "None", False, a_qtys[a_day, a_wh, a_pref])
+
+        if not l_frames:
+
+            return pd.DataFrame(columns= ["entity", "time", "preference", "product", "fulfilled", "qty"])
+
+        df = pd.concat(l_frames, ignore_index= True)
+
+        return df.sort_values(["entity", "time"], kind= "stable").reset_index(drop= True)
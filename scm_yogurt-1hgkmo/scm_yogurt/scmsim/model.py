@@ -0,0 +1,214 @@
+import simpy
+import functools
+import numpy as np
+
+import scmsim.framework.demand         as demand
+import scmsim.framework.supply         as supply
+import scmsim.framework.warehousing    as warehousing
+import scmsim.framework.inventory      as inventory
+import scmsim.framework.manufacturing  as manufacturing
+import scmsim.framework.allocation     as allocation
+import scmsim.framework.replay         as replay
+import scmsim.utils                    as utils
+
+def build_model(
+         mfgqty_mu            :float,
+         mfgqty_sigma        :float,
+         mfg_normal          :bool,
+         l_mfggroups         :list,
+         l_mfgshares         :list,
+         lifetime            :int,
+         dmndqty_mu          :float,
+         dmndqty_sigma       :float,
+         dmnd_normal         :bool,
+         l_dmndprefs         :list,
+         l_dmndprefprobs     :list,
+         n_warehouses        :int,
+         supplierqty_mu      :float,
+         supplierqty_sigma   :float,
+         supplier_normal     :bool,
+         l_supplyprodgroups  :list,
+         l_supplyprodshares  :list,
+         l_deliveryleadtimes :list,
+         inventorybackend    :str = "units",
+         batched             :bool = False,
+         seed                :int = None,
+         allocation_rule     :str = "preference",
+         recorder            :object = None, # e.g. recording.AggregateRecorder, receives all sales orders
+         env                 :object = None, # simpy.Environment (created if None), or a utils.Clock for stepping without SimPy
+         demandtrace         :object = None, # replay.NumpyTrace or replay.ArrowTrace replacing sampled demand
+         supplytrace         :object = None, # trace replacing sampled warehouse purchases
+         productiontrace     :object = None, # trace replacing sampled production, site 0
+         l_tracesites        :list = None,   # per warehouse, its site in the traces, or None to sample; default: site i_wh
+         tracestart          :int = 0,       # trace day replayed on simulation day 0
+         rationing           :str = None,    # daily allocation phase rule, "random", "proportional" or "priority"; None: warehouses order on their own
+         l_priorities        :list = None,   # per warehouse, for rationing "priority", lower is served first
+         d_inventorybackends :dict = None,   # key: entity, e.g. "warehouse 2", value: backend overriding inventorybackend
+         store               :object = None, # e.g. traceability.TraceabilityStore, receives every units lifecycle
+         fluidvolume         :float = None   # batched only: groups with an expected daily purchase per warehouse of at least fluidvolume units are tracked as continuous flows
+         ) -> tuple:
+    """
+    
+    sets up the model behind api.run and api.iter_run; 
+    with a simpy.Environment all processes are registered but not yet run
+
+    with traces, demand, purchases and production are replayed instead of sampled;
+    warehouses whose entry in l_tracesites is None keep sampling (mixed mode)
+
+    with rationing, one allocation.AllocationPhase process runs each day in fixed phases instead of 
+    a production process and warehouse processes with random offsets
+
+    with fluidvolume, high-volume groups (get_fluidgroups) are produced, purchased, stocked and demanded as fractional 
+    quantities in inventory.FluidInventoryGroup, while all other groups stay discrete in the chosen backend
+
+    returns:
+    - (env, manufacturing.Manufacturer, list of warehousing.Warehouse)
+
+    """
+
+    d_inventorybackends = d_inventorybackends or {}
+
+    for backend in [inventorybackend] + list(d_inventorybackends.values()):
+
+        if backend not in inventory.d_backends:
+
+            raise ValueError(f"unknown inventory backend: {backend}, choose from {list(inventory.d_backends)}")
+
+    fluidgroups = []
+
+    if fluidvolume is not None:
+
+        if not batched: raise ValueError("fluidvolume requires batched= True")
+
+        if store is not None: raise ValueError("fluidvolume can not be combined with a traceability store, which numbers whole units")
+
+        fluidgroups = get_fluidgroups(supplierqty_mu, supplierqty_sigma, supplier_normal, l_supplyprodgroups, l_supplyprodshares, fluidvolume)
+
+    def get_inventorymodel(entity :str) -> type:
+
+        backend = inventory.d_backends[d_inventorybackends.get(entity, inventorybackend)]
+
+        if fluidgroups: return functools.partial(inventory.HybridInventory, discretemodel= backend, fluidgroups= fluidgroups)
+
+        return backend
+
+    if allocation_rule != "preference" and not batched:
+
+        raise ValueError(f"allocation rule {allocation_rule} requires batched= True")
+
+    if rationing is not None and not batched:
+
+        raise ValueError(f"rationing {rationing} requires batched= True")
+
+    if seed is None: seed = np.random.SeedSequence().entropy
+
+    if env is None: env = simpy.Environment()
+
+    if l_tracesites is None: l_tracesites = list(range(n_warehouses))
+
+    # setup supplying manufacturers
+    s = manufacturing.Manufacturer(
+                                id = 1,
+                                env = env, 
+                                qty_mu= mfgqty_mu, 
+                                qty_sigma= mfgqty_sigma,
+                                gaussian =  mfg_normal,
+                                l_groups= l_mfggroups, 
+                                l_probs= l_mfgshares, 
+                                shelflife= inventory.ShelfLife(lifetime= lifetime),
+                                inventorymodel= get_inventorymodel("manufacturer 1"),
+                                rng= utils.get_stream(seed, utils.STREAM_MANUFACTURER, 1),
+                                productionmodel= replay.TraceProduction(env= env, trace= productiontrace, l_groups= l_mfggroups, day_start= tracestart) if productiontrace is not None else None,
+                                fluidgroups= fluidgroups
+                                )
+    if recorder: s.l_processedorders = recorder.channel(str(s))
+
+    s.store = store
+    
+    if isinstance(env, simpy.Environment) and rationing is None: env.process(s.production())
+
+    # setup end-warehouses
+    whs = []
+    for i_wh in range(n_warehouses):
+
+        site = l_tracesites[i_wh]
+
+        dm = demand.DemandPattern(
+                                qty_mu= dmndqty_mu, 
+                                qty_sigma= dmndqty_sigma,
+                                gaussian = dmnd_normal, 
+                                l_preferences= l_dmndprefs, 
+                                l_probs= l_dmndprefprobs,
+                                rng= utils.get_stream(seed, utils.STREAM_DEMAND, i_wh+1),
+                                fluidgroups= fluidgroups
+                                )
+        
+        sm = supply.SupplyPattern(
+                                supplier= s, 
+                                qty_mu= supplierqty_mu,
+                                qty_sigma= supplierqty_sigma,
+                                gaussian = supplier_normal,  
+                                l_groups= l_supplyprodgroups, 
+                                l_probs= l_supplyprodshares,
+                                rng= utils.get_stream(seed, utils.STREAM_SUPPLY, i_wh+1),
+                                fluidgroups= fluidgroups
+                                )
+
+        if demandtrace is not None and site is not None:
+
+            dm = replay.TraceDemand(env= env, trace= demandtrace, site= site, l_preferences= l_dmndprefs, day_start= tracestart)
+
+        if supplytrace is not None and site is not None:
+
+            sm = replay.TraceSupply(env= env, supplier= s, trace= supplytrace, site= site, l_groups= l_supplyprodgroups, day_start= tracestart)
+
+        wh = warehousing.Warehouse(
+                                id = i_wh+1,
+                                env= env, 
+                                demandmodel= dm, 
+                                supplymodel= sm, 
+                                leadtime= l_deliveryleadtimes[i_wh],
+                                inventorymodel= get_inventorymodel(f"warehouse {i_wh+1}"),
+                                batched= batched,
+                                rng= utils.get_stream(seed, utils.STREAM_ORDERING, i_wh+1),
+                                allocator= allocation.SubstitutionAllocator(l_preferences= dm.l_preferences, rule= allocation_rule, fluidgroups= fluidgroups)
+                                )
+
+        if recorder: wh.l_processedorders = recorder.channel(str(wh))
+
+        wh.store = store
+
+        if isinstance(env, simpy.Environment) and rationing is None: env.process(wh.warehousing())
+
+        whs.append(wh)
+
+    if rationing is not None:
+
+        phase = allocation.AllocationPhase(
+                                env= env,
+                                supplier= s,
+                                whs= whs,
+                                rationing= allocation.get_rationing(rule= rationing, rng= utils.get_stream(seed, utils.STREAM_ORDERING), l_priorities= l_priorities)
+                                )
+
+        if isinstance(env, simpy.Environment): env.process(phase.process())
+
+    return env, s, whs
+
+def get_fluidgroups(
+         supplierqty_mu      :float,
+         supplierqty_sigma   :float,
+         supplier_normal     :bool,
+         l_supplyprodgroups  :list,
+         l_supplyprodshares  :list,
+         fluidvolume         :float
+         ) -> list:
+    """
+    
+    returns the groups whose expected daily purchase per warehouse, share times expected total, is at least fluidvolume units
+
+    """
+
+    qty_total = supplierqty_mu if supplier_normal else np.exp(supplierqty_mu + supplierqty_sigma**2/2)
+
+    return [g for g, share in zip(l_supplyprodgroups, l_supplyprodshares) if share*qty_total >= fluidvolume]
@@ -0,0 +1,240 @@
+import multiprocessing
+import multiprocessing.connection
+import numpy as np
+import pandas as pd
+
+import scmsim.framework.inventory      as inventory
+import scmsim.framework.allocation     as allocation
+import scmsim.framework.recording      as recording
+import scmsim.model                    as model
+import scmsim.utils                    as utils
+
+class WarehouseGroup:
+
+    """
+
+    a group of batched warehouses stepped day by day, in the parent process or in a worker process;
+    the model is built by model.build_model as for api.run(batched= True, rationing= "random"),
+    and only the warehouses of the group are stepped; the allocation phase runs in the parent, 
+    so the allocated products are handed over as plain tuples
+
+    every warehouse draws from its own streams (utils.get_stream keyed by warehouse id),
+    so results do not depend on how warehouses are grouped
+
+    """
+
+    clock     :utils.Clock
+    recorder  :recording.AggregateRecorder
+    d_whs     :dict # key: warehouse id, value: warehousing.Warehouse
+
+    def __init__(self,
+                 l_ids   :list, # warehouse ids of this group
+                 d_model :dict  # keyword arguments of model.build_model
+                 ):
+
+        self.clock    = utils.Clock()
+        self.recorder = recording.AggregateRecorder()
+
+        _, _, whs = model.build_model(**d_model, env= self.clock, recorder= self.recorder)
+
+        self.d_whs = {wh.id: wh for wh in whs if wh.id in l_ids}
+
+    def plan(self,
+             day :int
+             ) -> dict:
+        """
+
+        returns the purchase quantities per warehouse for day
+
+        """
+
+        self.clock.now = day
+
+        return {id: wh.supplymodel.get_purchaseqtys() for id, wh in self.d_whs.items()}
+
+    def deliver(self,
+                day           :int,
+                d_allocations :dict # key: warehouse id, value: list of (groupstr, date_mfg, date_val, qty)
+                ) -> None:
+        """
+
+        puts the allocated products in transit and runs the rest of the day at each warehouse
+
+        """
+
+        self.clock.now = day
+
+        for id, wh in self.d_whs.items():
+
+            wh.accept_purchase([inventory.Product(groupstr= g, date_mfg= date_mfg, date_val= date_val), qty] for g, date_mfg, date_val, qty in d_allocations[id])
+            wh.operate()
+
+def worker(conn  :multiprocessing.connection.Connection,
+           d_kw  :dict
+           ) -> None:
+    """
+
+    worker process: owns one WarehouseGroup and answers the parents daily messages;
+    after each delivery it returns the next days plan, so one round trip per day is enough
+
+    """
+
+    group = WarehouseGroup(**d_kw)
+    conn.send(group.plan(day= 0))
+
+    while True:
+
+        msg, day, d_allocations = conn.recv()
+
+        if msg == "deliver":
+
+            group.deliver(day= day, d_allocations= d_allocations)
+            conn.send(group.plan(day= day + 1))
+
+        elif msg == "close":
+
+            conn.send(group.recorder.d_counts)
+            conn.close()
+            return
+
+def run(
+        mfgqty_mu           :float,
+        mfgqty_sigma        :float,
+        mfg_normal          :bool,
+        l_mfggroups         :list,
+        l_mfgshares         :list,
+        lifetime            :int,
+        dmndqty_mu          :float,
+        dmndqty_sigma       :float,
+        dmnd_normal         :bool,
+        l_dmndprefs         :list,
+        l_dmndprefprobs     :list,
+        n_warehouses        :int,
+        supplierqty_mu      :float,
+        supplierqty_sigma   :float,
+        supplier_normal     :bool,
+        l_supplyprodgroups  :list,
+        l_supplyprodshares  :list,
+        l_deliveryleadtimes :list,
+        simlength           :int,
+        n_workers           :int = 1,
+        seed                :int = None,
+        inventorybackend    :str = "cohorts"
+        ) -> pd.DataFrame:
+    """
+
+    runs the batched model with warehouses split across n_workers worker processes;
+    the manufacturer stays in the calling process, and its daily stock allocation is the only synchronization point
+
+    each day is the allocation phase of api.run(batched= True, rationing= "random") split across processes,
+    with every entity built by model.build_model; for a given seed, results are identical to 
+    api.run(batched= True, rationing= "random", result_mode= "aggregated", env= None) for any n_workers 
+    (n_workers <= 1 runs in-process)
+
+    returns:
+    - pandas.DataFrame in the format of api.run(result_mode= "aggregated")
+
+    """
+
+    if seed is None: seed = np.random.SeedSequence().entropy
+
+    d_model = dict(
+                    mfgqty_mu= mfgqty_mu,
+                    mfgqty_sigma= mfgqty_sigma,
+                    mfg_normal= mfg_normal,
+                    l_mfggroups= l_mfggroups,
+                    l_mfgshares= l_mfgshares,
+                    lifetime= lifetime,
+                    dmndqty_mu= dmndqty_mu,
+                    dmndqty_sigma= dmndqty_sigma,
+                    dmnd_normal= dmnd_normal,
+                    l_dmndprefs= l_dmndprefs,
+                    l_dmndprefprobs= l_dmndprefprobs,
+                    n_warehouses= n_warehouses,
+                    supplierqty_mu= supplierqty_mu,
+                    supplierqty_sigma= supplierqty_sigma,
+                    supplier_normal= supplier_normal,
+                    l_supplyprodgroups= l_supplyprodgroups,
+                    l_supplyprodshares= l_supplyprodshares,
+                    l_deliveryleadtimes= l_deliveryleadtimes,
+                    inventorybackend= inventorybackend,
+                    batched= True,
+                    seed= seed,
+                    rationing= "random"
+                    )
+
+    clock    = utils.Clock()
+    recorder = recording.AggregateRecorder()
+
+    # only the manufacturer of the parents model is stepped, its warehouses are stepped by the groups
+    _, s, whs = model.build_model(**d_model, env= clock, recorder= recorder)
+
+    l_ids     = [wh.id for wh in whs]
+    l_groups  = whs[0].supplymodel.l_groups
+    rationing = allocation.get_rationing(rule= "random", rng= utils.get_stream(seed, utils.STREAM_ORDERING)) # the stream of the allocation phase in build_model
+
+    def allocate(day :int, d_plans :dict) -> dict:
+        """
+
+        allocation.AllocationPhase.run_day up to the receipts: production and one rationed allocation of all requests
+
+        """
+
+        clock.now = day
+        s.produce()
+
+        l_requests = [d_plans[id] for id in l_ids]
+        a_requests = np.array(l_requests, dtype= np.result_type(np.int64, *l_requests)).reshape(len(l_ids), len(l_groups))
+
+        l_allocations = s.distribution_rationed(l_groups= l_groups, a_requests= a_requests, rationing= rationing)
+
+        return {id: [(p.groupstr, p.date_mfg, p.date_val, qty) for p, qty in l_slices] for id, l_slices in zip(l_ids, l_allocations)}
+
+    if n_workers <= 1:
+
+        group = WarehouseGroup(l_ids= l_ids, d_model= d_model)
+
+        for day in range(simlength):
+
+            group.deliver(day= day, d_allocations= allocate(day, group.plan(day= day)))
+
+        recorder.d_counts.update(group.recorder.d_counts)
+
+        return recorder.to_frame()
+
+    # contiguous blocks of warehouses per worker
+    l_conns = []
+
+    for l_block in np.array_split(np.array(l_ids), min(n_workers, n_warehouses)):
+
+        conn, conn_worker = multiprocessing.Pipe()
+        process = multiprocessing.Process(target= worker, args= (conn_worker, dict(l_ids= [int(id) for id in l_block], d_model= d_model)), daemon= True)
+        process.start()
+        l_conns.append((conn, [int(id) for id in l_block], process))
+
+    d_plans = {}
+
+    for conn, _, _ in l_conns:
+
+        d_plans.update(conn.recv())
+
+    for day in range(simlength):
+
+        d_allocations = allocate(day, d_plans)
+
+        for conn, l_block, _ in l_conns:
+
+            conn.send(("deliver", day, {id: d_allocations[id] for id in l_block}))
+
+        # barrier: every group has finished the day once it returns the next days plan
+        for conn, _, _ in l_conns:
+
+            d_plans.update(conn.recv())
+
+    for conn, _, process in l_conns:
+
+        conn.send(("close", None, None))
+        recorder.d_counts.update(conn.recv())
+        process.join()
+
+    return recorder.to_frame()
@@ -0,0 +1,206 @@
+import copy
+import concurrent.futures
+import numpy as np
+import pandas as pd
+
+import scmsim.framework.recording      as recording
+import scmsim.utils                    as utils
+import scmsim.model                    as model
+
+class SteppedModel:
+
+    """
+
+    the model of api.run, stepped day by day without SimPy;
+    its whole state (inventories, in-transit deliveries, random streams, results so far) consists of plain objects,
+    so it can be snapshotted at any day and forked into scenario continuations, in-process or in worker processes
+
+    warehouses act in a random order per day, drawn from the ordering stream, as the t_diff jitter does in api.run;
+    callable leadtimes must be picklable to branch in worker processes
+
+    """
+
+    day       :int
+    clock     :utils.Clock
+    recorder  :recording.AggregateRecorder
+    s         :object # manufacturing.Manufacturer
+    whs       :list   # list of warehousing.Warehouse
+    ordering  :object # np.random.Generator
+
+    def __init__(self,
+                 mfgqty_mu           :float,
+                 mfgqty_sigma        :float,
+                 mfg_normal          :bool,
+                 l_mfggroups         :list,
+                 l_mfgshares         :list,
+                 lifetime            :int,
+                 dmndqty_mu          :float,
+                 dmndqty_sigma       :float,
+                 dmnd_normal         :bool,
+                 l_dmndprefs         :list,
+                 l_dmndprefprobs     :list,
+                 n_warehouses        :int,
+                 supplierqty_mu      :float,
+                 supplierqty_sigma   :float,
+                 supplier_normal     :bool,
+                 l_supplyprodgroups  :list,
+                 l_supplyprodshares  :list,
+                 l_deliveryleadtimes :list,
+                 inventorybackend    :str = "units",
+                 batched             :bool = False,
+                 seed                :int = None,
+                 allocation_rule     :str = "preference"
+                 ):
+
+        if seed is None: seed = np.random.SeedSequence().entropy
+
+        self.day      = 0
+        self.clock    = utils.Clock()
+        self.recorder = recording.AggregateRecorder()
+
+        _, self.s, self.whs = model.build_model(
+                            mfgqty_mu= mfgqty_mu,
+                            mfgqty_sigma= mfgqty_sigma,
+                            mfg_normal= mfg_normal,
+                            l_mfggroups= l_mfggroups,
+                            l_mfgshares= l_mfgshares,
+                            lifetime= lifetime,
+                            dmndqty_mu= dmndqty_mu,
+                            dmndqty_sigma= dmndqty_sigma,
+                            dmnd_normal= dmnd_normal,
+                            l_dmndprefs= l_dmndprefs,
+                            l_dmndprefprobs= l_dmndprefprobs,
+                            n_warehouses= n_warehouses,
+                            supplierqty_mu= supplierqty_mu,
+                            supplierqty_sigma= supplierqty_sigma,
+                            supplier_normal= supplier_normal,
+                            l_supplyprodgroups= l_supplyprodgroups,
+                            l_supplyprodshares= l_supplyprodshares,
+                            l_deliveryleadtimes= l_deliveryleadtimes,
+                            inventorybackend= inventorybackend,
+                            batched= batched,
+                            seed= seed,
+                            allocation_rule= allocation_rule,
+                            recorder= self.recorder,
+                            env= self.clock
+                            )
+
+        self.ordering = utils.get_stream(seed, utils.STREAM_ORDERING)
+
+    def step(self) -> None:
+        """
+
+        advances the model by one day
+
+        """
+
+        self.clock.now = self.day
+        self.s.produce()
+
+        for i_wh in self.ordering.permutation(len(self.whs)):
+
+            self.whs[i_wh].purchase()
+            self.whs[i_wh].operate()
+
+        self.day += 1
+
+    def run(self,
+            until :int
+            ) -> "SteppedModel":
+
+        while self.day < until:
+
+            self.step()
+
+        return self
+
+    def snapshot(self) -> "SteppedModel":
+        """
+
+        returns an independent copy of the full model state
+
+        """
+
+        return copy.deepcopy(self)
+
+    def fork(self,
+             leadtimes      :list = None,  # new leadtime per warehouse, applies to purchases from now on
+             lifetime       :int = None,   # new product lifetime, applies to production from now on
+             dmndqty_mu     :float = None,
+             supplierqty_mu :float = None,
+             mfgqty_mu      :float = None,
+             seed           :int = None    # if given, all streams are re-derived from seed, e.g. for replications
+             ) -> "SteppedModel":
+        """
+
+        returns a snapshot with the given changes applied, to be continued as a scenario
+
+        """
+
+        branch = self.snapshot()
+
+        if leadtimes is not None:
+
+            for wh, leadtime in zip(branch.whs, leadtimes): wh.leadtime = leadtime
+
+        if lifetime is not None: branch.s.shelflife.lifetime = lifetime
+
+        if mfgqty_mu is not None: branch.s.qty_mu = mfgqty_mu
+
+        for wh in branch.whs:
+
+            if dmndqty_mu is not None: wh.demandmodel.qty_mu = dmndqty_mu
+
+            if supplierqty_mu is not None: wh.supplymodel.qty_mu = supplierqty_mu
+
+        if seed is not None:
+
+            branch.s.rng  = utils.get_stream(seed, utils.STREAM_MANUFACTURER, branch.s.id)
+            branch.ordering = utils.get_stream(seed, utils.STREAM_ORDERING)
+
+            for wh in branch.whs:
+
+                wh.demandmodel.rng = utils.get_stream(seed, utils.STREAM_DEMAND, wh.id)
+                wh.supplymodel.rng = utils.get_stream(seed, utils.STREAM_SUPPLY, wh.id)
+
+        return branch
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+
+        returns the results so far in the format of api.run(result_mode= "aggregated")
+
+        """
+
+        return self.recorder.to_frame()
+
+def run_branch(branch :SteppedModel,
+               until  :int
+               ) -> pd.DataFrame:
+
+    return branch.run(until= until).to_frame()
+
+def run_branches(snapshot    :SteppedModel,
+                 l_scenarios :list, # list of dicts of SteppedModel.fork arguments
+                 until       :int,
+                 n_workers   :int = 1
+                 ) -> list:
+    """
+
+    forks one continuation of snapshot per scenario and runs each until day until;
+    with n_workers > 1 the continuations run in worker processes
+
+    returns:
+    - list of pandas.DataFrame, per scenario, including the shared prefix
+
+    """
+
+    l_branches = [snapshot.fork(**d_changes) for d_changes in l_scenarios]
+
+    if n_workers <= 1:
+
+        return [run_branch(branch, until) for branch in l_branches]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers= n_workers) as executor:
+
+        return list(executor.map(run_branch, l_branches, [until]*len(l_branches)))
@@ -1 +1,36 @@
-pass
\ No newline at end of file
+import numpy as np
+
+# stream keys for random number streams, see get_stream
+STREAM_MANUFACTURER = 0
+STREAM_DEMAND       = 1
+STREAM_SUPPLY       = 2
+STREAM_ORDERING     = 3
+
+def get_stream(seed :int,
+               *key :int
+               ) -> np.random.Generator:
+    """
+
+    returns the random number stream identified by key (e.g. STREAM_DEMAND, warehouse id) under the master seed;
+    the same seed and key always give the same stream, independent of which other streams exist
+
+    """
+
+    return np.random.default_rng(np.random.SeedSequence(entropy= seed, spawn_key= key))
+
+class Clock:
+
+    """
+
+    stand-in for simpy.Environment when entities are stepped day by day without an event loop;
+    entities only read now
+
+    """
+
+    now :float
+
+    def __init__(self,
+                 now :float = 0
+                 ):
+
+        self.now = now
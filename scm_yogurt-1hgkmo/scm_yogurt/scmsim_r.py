@@ -1,5 +1,6 @@
 from scmsim import api
 
+import tempfile
 import pandas as pd
 
 if __name__ == "__main__":
@@ -52,8 +53,69 @@ def run(
         l_supplyprodgroups  :list,
         l_supplyprodshares  :list,
         l_deliveryleadtimes :list,
-        simlength           :int
-        ) -> pd.DataFrame:
+        simlength           :int,
+        output              :str = "pandas", # "pandas", "recordbatch" or "feather"
+        path                :str = None # feather file to write, a temporary file if None
+        ): # -> pandas.DataFrame, pyarrow.RecordBatch or str
+    """
+    
+    entry point for R (reticulate), see app.R
+
+    returns, depending on output:
+    - "pandas": pandas.DataFrame with one row per unit sales order, as api.run
+    - "recordbatch": pyarrow.RecordBatch with the same rows and dictionary-encoded entity, preference and product;
+      reticulate hands it to the R arrow package without converting rows
+    - "feather": path of an uncompressed Arrow IPC (Feather V2) file with the same columns, 
+      e.g. for arrow::read_feather(path, as_data_frame= FALSE), which memory-maps it
+
+    rows of the arrow outputs are in order of occurrence rather than grouped by entity
+
+    """
+
+    if output not in ("pandas", "recordbatch", "feather"):
+
+        raise ValueError(f"unknown output: {output}, choose from ['pandas', 'recordbatch', 'feather']")
+
+    if output != "pandas":
+
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        table = api.run(
+            mfgqty_mu,
+            mfgqty_sigma,
+            mfg_normal,
+            l_mfggroups,
+            l_mfgshares,
+            lifetime,
+            dmndqty_mu,
+            dmndqty_sigma,
+            dmnd_normal,
+            l_dmndprefs,
+            l_dmndprefprobs,
+            n_warehouses,
+            supplierqty_mu,
+            supplierqty_sigma,
+            supplier_normal,
+            l_supplyprodgroups,
+            l_supplyprodshares,
+            l_deliveryleadtimes,
+            simlength,
+            result_mode= "arrow"
+            )
+
+        if output == "recordbatch":
+
+            return pa.RecordBatch.from_arrays([column.combine_chunks() for column in table.columns], names= table.column_names)
+
+        if path is None:
+
+            with tempfile.NamedTemporaryFile(suffix= ".feather", delete= False) as f: path = f.name
+
+        # uncompressed, so readers can memory-map the file instead of decoding it
+        feather.write_feather(table, path, compression= "uncompressed")
+
+        return path
     
     return api.run(
         mfgqty_mu,
@@ -1,65 +1,59 @@
-from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Optional
 import random
 import simpy
-import numpy as np
-from collections import defaultdict
+from simpy.core import StopSimulation
 import config
-import logging
-
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-@dataclass
-class Order:
-    """Represents a manufacturing order in the system"""
-    id: int
-    arrival_time: float
-    batch_id: int
-    start_time: Optional[float] = None
-    completion_time: Optional[float] = None
-    current_machine: Optional[str] = None
-    withdrawn: bool = False
+import tracing
+from accumulators import RunningStats, TimeWeighted
+from monitors import MonitoredResource, MonitoredStore
+from order_table import OrderTable
+from tracing import EventType
 
 class ManufacturingLineSimulation:
-    def __init__(self, env: simpy.Environment):
+    def __init__(self, env: simpy.Environment, tracer: Optional[tracing.Tracer] = None):
         self.env = env
+        # Per-order events go to the tracer; check tracer.enabled before recording
+        self.tracer = tracer if tracer is not None else tracing.Tracer(enabled=False)
         self.order_counter = 0
         self.batch_counter = 0
         self.total_arrivals = 0
+        self.active_orders = 0  # order processes still running
+        self.source_done = False
+        self.drained = env.event()  # succeeds once all orders have left the system
+
+        # Processes and queues refer to orders by id; with ORDER_TABLE, the id is the order's row in the table
+        self.orders = OrderTable(len(config.MACHINE_CONFIG)) if config.TRACKING_CONFIG['ORDER_TABLE'] else None
         
-        # Create resources (machines)
+        # Create resources (machines), tracking busy servers over time
         self.machines = {
-            name: simpy.Resource(env, config.MACHINE_CONFIG[name].capacity)
+            name: MonitoredResource(env, config.MACHINE_CONFIG[name].capacity)
             for name in config.MACHINE_CONFIG
         }
         
-        # Create stores for queues with limited capacity
+        # Create stores for queues with limited capacity, tracking their length over time
         self.queues = {
-            name: simpy.Store(env, capacity=config.QUEUE_CONFIG[name].capacity)
+            name: MonitoredStore(env, capacity=config.QUEUE_CONFIG[name].capacity)
             for name in config.QUEUE_CONFIG
         }
         
-        # Statistics tracking
+        # Statistics tracking; per-order times go into online accumulators, so memory stays flat with run length.
+        # Queue lengths, busy servers and WIP are time-weighted and updated on every change, without polling
         self.stats = {
-            'queue_lengths': defaultdict(list),
-            'machine_utilization': defaultdict(list),
+            'queue_lengths': {name: queue.length for name, queue in self.queues.items()},
+            'machine_utilization': {name: machine.busy for name, machine in self.machines.items()},
+            'wip_level': TimeWeighted(0, env.now),
+            'waiting_times': {name: RunningStats() for name in self.queues},
+            'lead_times': RunningStats(),
+            'flow_times': RunningStats(),
             'completed_orders': 0,
             'blocked_orders': 0,
             'wip': 0,
-            'waiting_times': defaultdict(list),
-            'processing_times': defaultdict(list),
-            'lead_times': [],
-            'flow_times': [],
             'total_revenue': 0,
             'total_costs': 0,
             'opportunity_costs': 0,
             'backlog_costs': 0,
             'inventory_costs': 0
         }
-        
-        # Start statistics collection
-        if config.TRACKING_CONFIG['COLLECT_QUEUE_STATS']:
-            env.process(self.collect_statistics())
 
     def order_source(self):
         """Generate orders according to configured arrival pattern"""
@@ -67,46 +61,66 @@ class ManufacturingLineSimulation:
             # Generate batch of orders
             batch_size = config.get_batch_size()
             self.batch_counter += 1
-            logging.info(f"Generated batch {self.batch_counter} with size {batch_size}")
             
             for _ in range(batch_size):
                 if self.total_arrivals < config.SYSTEM_CONFIG['MAX_ORDERS']:
-                    order = Order(
-                        id=self.order_counter + 1,
-                        arrival_time=self.env.now,
-                        batch_id=self.batch_counter
-                    )
+                    order_id = self.order_counter
+                    if self.orders is not None:
+                        self.orders.add(self.env.now, self.batch_counter)
                     self.order_counter += 1
                     self.total_arrivals += 1
-                    self.stats['wip'] += 1
-                    logging.info(f"Order {order.id} generated at time {self.env.now:.2f}")
+                    self.active_orders += 1
+                    self.update_wip(1)
+                    if self.tracer.enabled:
+                        self.tracer.record(order_id, -1, EventType.CREATED, self.env.now)
                     
                     # Start processing the order
-                    self.env.process(self.process_order(order))
+                    self.env.process(self.process_order(order_id, self.env.now))
             
             # Wait for next arrival according to rate
             yield self.env.timeout(config.TIME_CONFIG['ARRIVAL_RATE'])
 
-    def process_order(self, order):
+        self.source_done = True
+        self.check_drained()
+
+    def update_wip(self, change: int):
+        """Change the WIP count and its time-weighted level"""
+        self.stats['wip'] += change
+        self.stats['wip_level'].update(self.stats['wip'], self.env.now)
+
+    def check_drained(self):
+        """Signal `drained` once the source is done and no order is left"""
+        if self.source_done and self.active_orders == 0 and not self.drained.triggered:
+            self.drained.succeed()
+
+    def process_order(self, order_id: int, arrival_time: float):
         """Process an order through all machines"""
+        orders = self.orders
 
         # Process through each machine in sequence
-        for machine_name in config.MACHINE_CONFIG:
-            order.current_machine = machine_name
+        for station, machine_name in enumerate(config.MACHINE_CONFIG):
             queue_name = f'Q{machine_name[1]}'
             
             # Try to enter queue
             if len(self.queues[queue_name].items) >= self.queues[queue_name].capacity:
                 self.stats['blocked_orders'] += 1
                 self.stats['opportunity_costs'] += config.FINANCIAL_CONFIG['OPPORTUNITY_COST_PER_BLOCKED_ORDER']
-                logging.warning(f"Order {order.id} blocked at queue {queue_name}")
+                if orders is not None:
+                    orders.blocked_at[order_id] = station
+                if self.tracer.enabled:
+                    self.tracer.record(order_id, station, EventType.BLOCKED, self.env.now)
+                self.active_orders -= 1
+                self.check_drained()
                 return
             
-            queue_start_time = self.env.now
-            if order.start_time is None:
-                order.start_time = queue_start_time
-            yield self.queues[queue_name].put(order)
-            logging.info(f"Order {order.id} entered queue {queue_name} at time {self.env.now:.2f}")
+            enqueue_time = self.env.now
+            if station == 0:
+                start_time = enqueue_time  # orders start when entering the first queue
+            if orders is not None:
+                orders.enqueue_time[order_id, station] = enqueue_time
+            yield self.queues[queue_name].put(order_id)
+            if self.tracer.enabled:
+                self.tracer.record(order_id, station, EventType.ENQUEUED, self.env.now)
             
             # Request machine
             with self.machines[machine_name].request() as request:
@@ -114,75 +128,66 @@ class ManufacturingLineSimulation:
                 
                 # Remove from queue
                 yield self.queues[queue_name].get()
-                self.stats['waiting_times'][queue_name].append(self.env.now - queue_start_time)
-                logging.info(f"Order {order.id} started processing on {machine_name} at time {self.env.now:.2f}")
+                self.stats['waiting_times'][queue_name].add(self.env.now - enqueue_time)
+                if orders is not None:
+                    orders.start_time[order_id, station] = self.env.now
+                if self.tracer.enabled:
+                    self.tracer.record(order_id, station, EventType.STARTED, self.env.now)
                 
                 # Process the order
                 processing_time = config.get_processing_time(machine_name)
                 yield self.env.timeout(processing_time)
-                logging.info(f"Order {order.id} processing on {machine_name} with time {processing_time:.2f}")
-                
-                self.stats['processing_times'][machine_name].append(
-                    self.env.now - queue_start_time
-                )
+                if orders is not None:
+                    orders.finish_time[order_id, station] = self.env.now
+                if self.tracer.enabled:
+                    self.tracer.record(order_id, station, EventType.FINISHED, self.env.now)
 
         # Order completed successfully
-        order.completion_time = self.env.now
-        logging.info(f"Order {order.id} completed at time {self.env.now:.2f}")
-        self.process_completed_order(order)
+        if orders is not None:
+            orders.completion_time[order_id] = self.env.now
+        if self.tracer.enabled:
+            self.tracer.record(order_id, -1, EventType.COMPLETED, self.env.now)
+        self.process_completed_order(order_id, arrival_time, start_time)
+        self.active_orders -= 1
+        self.check_drained()
 
-    def process_completed_order(self, order):
+    def process_completed_order(self, order_id: int, arrival_time: float, start_time: float):
         """Handle completion of an order"""
         self.stats['completed_orders'] += 1
-        self.stats['wip'] -= 1
-        
-        # Calculate times
-        lead_time = order.completion_time - order.arrival_time
-        flow_time = order.completion_time - order.start_time
-        
-        self.stats['lead_times'].append(lead_time)
-        self.stats['flow_times'].append(flow_time)
+        self.update_wip(-1)
+        self.stats['lead_times'].add(self.env.now - arrival_time)
+        self.stats['flow_times'].add(self.env.now - start_time)
         
         # Calculate financials
         self.stats['total_revenue'] += config.FINANCIAL_CONFIG['REVENUE_PER_ORDER']
         self.stats['total_costs'] += config.FINANCIAL_CONFIG['COST_PER_ORDER']
 
-    def collect_statistics(self):
-        """Collect periodic statistics about the system"""
-        while True:
-            # Collect queue lengths
-            for queue_name, queue in self.queues.items():
-                self.stats['queue_lengths'][queue_name].append(len(queue.items))
-                self.stats['backlog_costs'] += len(queue.items) * config.FINANCIAL_CONFIG['BACKLOG_COST_PER_UNIT']
-            
-            # Collect machine utilization
-            for machine_name, machine in self.machines.items():
-                utilization = machine.count / machine.capacity if machine.capacity > 0 else 0
-                self.stats['machine_utilization'][machine_name].append(utilization)
-            
-            # Collect inventory costs
-            self.stats['inventory_costs'] += self.stats['wip'] * config.FINANCIAL_CONFIG['INVENTORY_COST_PER_UNIT']
-            
-            yield self.env.timeout(config.TRACKING_CONFIG['STATS_COLLECTION_INTERVAL'])
-
     def get_summary_statistics(self):
         """Calculate and return summary statistics"""
+        now = self.env.now
+        self.stats['backlog_costs'] = sum(
+            queue.length.integral(now) for queue in self.queues.values()
+        ) * config.FINANCIAL_CONFIG['BACKLOG_COST_PER_UNIT']
+        self.stats['inventory_costs'] = self.stats['wip_level'].integral(now) * config.FINANCIAL_CONFIG['INVENTORY_COST_PER_UNIT']
+
+        lead_times = self.stats['lead_times']
+        flow_times = self.stats['flow_times']
         return {
             'Completed Orders': self.stats['completed_orders'],
             'Blocked Orders': self.stats['blocked_orders'],
-            'Average Lead Time': np.mean(self.stats['lead_times']) if self.stats['lead_times'] else 0,
-            'Average Flow Time': np.mean(self.stats['flow_times']) if self.stats['flow_times'] else 0,
+            'Average Lead Time': lead_times.mean,
+            'Average Flow Time': flow_times.mean,
             'Machine Utilization': {
-                machine: np.mean(utilization) 
-                for machine, utilization in self.stats['machine_utilization'].items()
+                name: machine.utilization(now)
+                for name, machine in self.machines.items()
             },
             'Average Queue Lengths': {
-                queue: np.mean(lengths)
+                queue: lengths.mean(now)
                 for queue, lengths in self.stats['queue_lengths'].items()
             },
             'Average Waiting Times': {
-                queue: np.mean(times) if times else 0
-                for queue, times in self.stats['waiting_times'].items()
+                queue: times.mean
+                for queue, times in self.stats['waiting_times'].items() if times
             },
             'Final WIP': self.stats['wip'],
             'Total Revenue': self.stats['total_revenue'],
@@ -202,13 +207,21 @@ def run_simulation():
     env = simpy.Environment()
     
     # Create and set up simulation
-    simulation = ManufacturingLineSimulation(env)
+    tracer = tracing.from_config(config.TRACING_CONFIG)
+    simulation = ManufacturingLineSimulation(env, tracer)
     
     # Start order generation
     env.process(simulation.order_source())
+
+    # Stop as soon as every order has left the system
+    if config.TRACKING_CONFIG['STOP_WHEN_DRAINED']:
+        simulation.drained.callbacks.append(StopSimulation.callback)
     
     # Run simulation
     env.run(until=config.TIME_CONFIG['SIM_TIME'])
+
+    if tracer.enabled and config.TRACING_CONFIG['DUMP_PATH']:
+        tracer.dump(config.TRACING_CONFIG['DUMP_PATH'])
     
     return simulation.get_summary_statistics()
 
@@ -0,0 +1,72 @@
+from enum import IntEnum
+import numpy as np
+
+class EventType(IntEnum):
+    """Event types recorded by the tracer"""
+    CREATED = 0
+    ENQUEUED = 1
+    BLOCKED = 2
+    STARTED = 3
+    FINISHED = 4
+    COMPLETED = 5
+
+# Layout of one event in exported and dumped traces
+EVENT_DTYPE = np.dtype([
+    ('order_id', np.int64),
+    ('station', np.int16),  # index into the station names, -1 for events outside a station
+    ('event', np.int8),     # EventType
+    ('time', np.float64),
+])
+
+class Tracer:
+    """Bounded in-memory ring buffer of structured simulation events
+
+    The simulation checks `enabled` before building an event, so a disabled tracer
+    costs one attribute test per call site. Once the buffer is full the oldest
+    events are overwritten. With sample_every > 1 only orders whose id is a
+    multiple of it are traced, which keeps the full history of the sampled orders.
+    """
+
+    def __init__(self, enabled: bool = False, capacity: int = 65536, sample_every: int = 1):
+        if capacity < 1 or sample_every < 1:
+            raise ValueError("capacity and sample_every must be at least 1")
+        self.enabled = enabled
+        self.capacity = capacity
+        self.sample_every = sample_every
+        self.n_recorded = 0
+        self._buffer: list = [None] * capacity if enabled else []
+
+    def record(self, order_id: int, station: int, event: EventType, time: float):
+        """Store one event, overwriting the oldest one if the buffer is full"""
+        if order_id % self.sample_every:
+            return
+        self._buffer[self.n_recorded % self.capacity] = (order_id, station, event, time)
+        self.n_recorded += 1
+
+    @property
+    def n_dropped(self) -> int:
+        """Number of events overwritten since the start"""
+        return max(self.n_recorded - self.capacity, 0)
+
+    def to_array(self) -> np.ndarray:
+        """Return the buffered events in recording order as an EVENT_DTYPE array"""
+        n = min(self.n_recorded, self.capacity)
+        start = self.n_recorded % self.capacity if self.n_recorded > self.capacity else 0
+        events = self._buffer[start:n] + self._buffer[:start]
+        return np.array(events, dtype=EVENT_DTYPE)
+
+    def dump(self, path: str):
+        """Write the buffered events to a binary .npy file"""
+        np.save(path, self.to_array())
+
+def load(path: str) -> np.ndarray:
+    """Read events written by Tracer.dump"""
+    return np.load(path)
+
+def from_config(tracing_config: dict) -> Tracer:
+    """Create a tracer from a TRACING_CONFIG dictionary"""
+    return Tracer(
+        enabled=tracing_config['ENABLED'],
+        capacity=tracing_config['BUFFER_SIZE'],
+        sample_every=tracing_config['SAMPLE_EVERY'],
+    )